@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ChatOpenAIを毎回作る場合と、llm_clients.get_chat_llmで使い回す場合の
+1リクエストあたりのオーバーヘッドを比較するベンチマーク
+
+ローカルに立てたOpenAI互換のスタブサーバーへ問い合わせるので、APIキーや通信費は不要。
+サーバー側で受け付けたTCP接続数も表示し、Keep-Aliveで接続が再利用されていることを確認できる。
+
+使い方: python benchmarks/bench_llm_clients.py [-n 回数]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_COMPLETION = {
+    "id": "bench", "object": "chat.completion", "created": 0, "model": "bench",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "はい"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+}
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        type(self).connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps(_COMPLETION).encode('utf-8')
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _run(label: str, make_llm, requests: int) -> float:
+    from langchain_core.messages import HumanMessage
+    _StubHandler.connections = 0
+    start = time.perf_counter()
+    for _ in range(requests):
+        make_llm().invoke([HumanMessage(content="ping")])
+    elapsed = (time.perf_counter() - start) / requests * 1000
+    print(f"{label:<28} {elapsed:8.2f} ms/req  (TCP接続数: {_StubHandler.connections})")
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-n", "--requests", type=int, default=200)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    os.environ["OPENROUTER_API_BASE"] = base_url
+    os.environ.setdefault("OPENROUTER_API_KEY", "bench")
+
+    from langchain_openai import ChatOpenAI
+    import llm_clients
+    llm_clients.OPENROUTER_API_BASE = base_url
+
+    def fresh_client():
+        return ChatOpenAI(temperature=0.7, model="openai/gpt-3.5-turbo", openai_api_base=base_url, openai_api_key="bench")
+
+    def pooled_client():
+        return llm_clients.get_chat_llm("openai/gpt-3.5-turbo", 0.7)
+
+    fresh = _run("毎回ChatOpenAIを生成", fresh_client, args.requests)
+    pooled = _run("get_chat_llmで再利用", pooled_client, args.requests)
+    print(f"1リクエストあたりの削減: {fresh - pooled:.2f} ms ({(1 - pooled / fresh) * 100:.0f}%)")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
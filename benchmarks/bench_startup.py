@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+main.pyの起動時import時間を計測するベンチマーク
+
+python -X importtime の出力から、モジュールごとの累積import時間を表示する。
+main本体のimport時間が予算（--budget-ms）を超えたら終了コード1で終わるので、
+重いモジュールをうっかりトップレベルでimportしたときに気付ける。
+各モードのモジュール（自然言語・RAG・TTS）は依存関係があれば参考値として別に計測する。
+
+使い方: python benchmarks/bench_startup.py [--budget-ms 50] [--top 15]
+"""
+
+import os
+import sys
+import argparse
+import subprocess
+from typing import List, Tuple
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SUBSYSTEMS = ["integrated_langchain", "rag_mode", "tts_worker"]
+
+
+def measure_imports(statement: str) -> Tuple[bool, List[Tuple[str, int, int]]]:
+    """statementを新しいインタプリタで実行し、(成功したか, [(モジュール名, 自身のμs, 累積μs)])を返す"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=REPO_ROOT, capture_output=True, text=True
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        entries.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return result.returncode == 0, entries
+
+
+def _top_level(entries: List[Tuple[str, int, int]]) -> List[Tuple[str, int, int]]:
+    """トップレベルと、その直下でimportされたモジュールだけを返す"""
+    return [(name.strip(), self_us, cumulative_us) for name, self_us, cumulative_us in entries if not name.startswith("     ")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    ok, entries = measure_imports("import main")
+    if not ok:
+        print("main.pyのimportに失敗しました")
+        sys.exit(1)
+    print(f"{'モジュール':<40} {'累積[ms]':>10} {'自身[ms]':>10}")
+    for name, self_us, cumulative_us in sorted(_top_level(entries), key=lambda e: -e[2])[:args.top]:
+        print(f"{name:<40} {cumulative_us / 1000:10.2f} {self_us / 1000:10.2f}")
+
+    main_ms = next(cumulative_us for name, _, cumulative_us in entries if name.strip() == "main") / 1000
+    print(f"\nmain.py import時間: {main_ms:.2f} ms（予算 {args.budget_ms:.0f} ms）")
+
+    print("\n各モードを初めて選んだときの追加import時間:")
+    for subsystem in SUBSYSTEMS:
+        ok, sub_entries = measure_imports(f"import main; import {subsystem}")
+        if not ok:
+            print(f"  {subsystem:<30} 依存関係不足のため計測不可")
+            continue
+        sub_ms = next(cumulative_us for name, _, cumulative_us in sub_entries if name.strip() == subsystem) / 1000
+        print(f"  {subsystem:<30} {sub_ms:10.2f} ms")
+
+    if main_ms > args.budget_ms:
+        print("❌ 予算超過")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
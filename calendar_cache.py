@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import time
+import pickle
+import datetime
+import threading
+from typing import Callable, Dict, List, Optional
+from urllib.parse import urljoin
+
+from google.auth.credentials import AnonymousCredentials
+from google.auth.transport.requests import Request
+from google_auth_oauthlib.flow import InstalledAppFlow
+from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+from googleapiclient.http import BatchHttpRequest
+
+SCOPES = ['https://www.googleapis.com/auth/calendar']
+TOKEN_FILE = "config/token.pickle"
+CREDENTIALS_FILE = "config/credentials.json"
+# ローカルのフェイクサーバーなどに向ける場合に指定（例: http://127.0.0.1:8765/）
+CALENDAR_API_ENDPOINT = os.getenv("CALENDAR_API_ENDPOINT", "")
+CALENDAR_CACHE_FILE = os.getenv("CALENDAR_CACHE_FILE", "cache/calendar_events.json")
+# この秒数以内に同期済みなら、APIに問い合わせずローカルキャッシュだけで答える
+CALENDAR_SYNC_INTERVAL = float(os.getenv("CALENDAR_SYNC_INTERVAL", "30"))
+# 初回のフル同期で取得する過去の期間（日数）
+CALENDAR_SYNC_PAST_DAYS = int(os.getenv("CALENDAR_SYNC_PAST_DAYS", "30"))
+
+JST = datetime.timezone(datetime.timedelta(hours=9))
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def _load_credentials():
+    creds = None
+    if os.path.exists(TOKEN_FILE):
+        with open(TOKEN_FILE, 'rb') as token:
+            creds = pickle.load(token)
+    if not creds or not creds.valid:
+        if creds and creds.expired and creds.refresh_token:
+            creds.refresh(Request())
+        else:
+            if not os.path.exists(CREDENTIALS_FILE):
+                return None
+            flow = InstalledAppFlow.from_client_secrets_file(CREDENTIALS_FILE, SCOPES)
+            creds = flow.run_local_server(port=0)
+        with open(TOKEN_FILE, 'wb') as token:
+            pickle.dump(creds, token)
+    return creds
+
+
+def get_calendar_service():
+    """
+    Calendar APIのサービスを1度だけ作って使い回す。認証ファイルがなければNone
+
+    CALENDAR_API_ENDPOINTが設定されていれば、認証なしでそのエンドポイントに接続する。
+    """
+    global _service
+    with _service_lock:
+        if _service is not None:
+            return _service
+        if CALENDAR_API_ENDPOINT:
+            _service = build('calendar', 'v3', credentials=AnonymousCredentials(),
+                             client_options={"api_endpoint": CALENDAR_API_ENDPOINT}, static_discovery=True)
+            return _service
+        creds = _load_credentials()
+        if creds is None:
+            return None
+        _service = build('calendar', 'v3', credentials=creds, static_discovery=True)
+        return _service
+
+
+def new_batch_request(service, callback: Optional[Callable] = None) -> BatchHttpRequest:
+    """
+    バッチリクエストを作る
+
+    ディスカバリー文書のbatchPathはapi_endpointの指定を無視して本番に向くため、
+    CALENDAR_API_ENDPOINTが設定されていればそのホストの/batch/calendar/v3に送る。
+    """
+    if CALENDAR_API_ENDPOINT:
+        return BatchHttpRequest(callback=callback, batch_uri=urljoin(CALENDAR_API_ENDPOINT, "/batch/calendar/v3"))
+    return service.new_batch_http_request(callback=callback)
+
+
+def event_start(event: Dict) -> Optional[datetime.datetime]:
+    start = event.get('start', {})
+    if 'dateTime' in start:
+        dt = datetime.datetime.fromisoformat(start['dateTime'].replace('Z', '+00:00'))
+        return dt if dt.tzinfo else dt.replace(tzinfo=JST)
+    if 'date' in start:
+        return datetime.datetime.fromisoformat(start['date']).replace(tzinfo=JST)
+    return None
+
+
+class CalendarEventCache:
+    """
+    Googleカレンダーの予定のローカルキャッシュ
+
+    初回はフル同期し、以降はevents.listのsyncTokenで前回からの差分だけを取得する
+    （削除された予定はstatus=cancelledで届くのでキャッシュから消す）。
+    キーワード検索はローカルのキャッシュに対して行う。
+    syncTokenが失効した（410 Gone）場合はフル同期し直す。
+    """
+
+    def __init__(self, cache_file: str = CALENDAR_CACHE_FILE, calendar_id: str = 'primary'):
+        self.cache_file = cache_file
+        self.calendar_id = calendar_id
+        self.events: Dict[str, Dict] = {}
+        self.sync_token: Optional[str] = None
+        self.last_synced = 0.0
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as file:
+                data = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        if data.get("calendar_id") != self.calendar_id:
+            return
+        self.events = data.get("events", {})
+        self.sync_token = data.get("sync_token")
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.cache_file) or ".", exist_ok=True)
+        tmp_file = f"{self.cache_file}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as file:
+            json.dump({"calendar_id": self.calendar_id, "sync_token": self.sync_token, "events": self.events},
+                      file, ensure_ascii=False)
+        os.replace(tmp_file, self.cache_file)
+
+    def _fetch(self, service, sync_token: Optional[str]) -> None:
+        page_token = None
+        while True:
+            params = {"calendarId": self.calendar_id, "singleEvents": True, "maxResults": 250}
+            if page_token:
+                params["pageToken"] = page_token
+            if sync_token:
+                params["syncToken"] = sync_token
+            else:
+                time_min = datetime.datetime.now(JST) - datetime.timedelta(days=CALENDAR_SYNC_PAST_DAYS)
+                params["timeMin"] = time_min.isoformat()
+            result = service.events().list(**params).execute()
+            for event in result.get('items', []):
+                if event.get('status') == 'cancelled':
+                    self.events.pop(event['id'], None)
+                else:
+                    self.events[event['id']] = event
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                self.sync_token = result.get('nextSyncToken')
+                return
+
+    def sync(self, service=None, force: bool = False) -> bool:
+        """差分同期する。サービスが使えなければFalse"""
+        with self._lock:
+            if not force and time.time() - self.last_synced < CALENDAR_SYNC_INTERVAL:
+                return True
+            service = service or get_calendar_service()
+            if service is None:
+                return False
+            try:
+                if self.sync_token:
+                    self._fetch(service, self.sync_token)
+                else:
+                    self.events = {}
+                    self._fetch(service, None)
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                # syncToken失効。フル同期し直す
+                self.events = {}
+                self.sync_token = None
+                self._fetch(service, None)
+            self.last_synced = time.time()
+            self._save()
+            return True
+
+    def apply_event(self, event: Dict) -> None:
+        """自分で作成・更新した予定を同期を待たずにキャッシュへ反映する"""
+        with self._lock:
+            if event.get('status') == 'cancelled':
+                self.events.pop(event['id'], None)
+            else:
+                self.events[event['id']] = event
+
+    def search(self, query: str = "", days: int = 7, limit: int = 10) -> List[Dict]:
+        """今からdays日以内の予定を開始時刻順に返す。queryはタイトル・説明・場所の部分一致"""
+        now = datetime.datetime.now(JST)
+        until = now + datetime.timedelta(days=days)
+        keyword = query.lower().strip()
+        matched = []
+        with self._lock:
+            for event in self.events.values():
+                start = event_start(event)
+                if start is None or not now <= start < until:
+                    continue
+                if keyword:
+                    text = " ".join(event.get(field, '') for field in ('summary', 'description', 'location')).lower()
+                    if keyword not in text:
+                        continue
+                matched.append((start, event))
+        matched.sort(key=lambda item: item[0])
+        return [event for _, event in matched[:limit]]
+
+
+_event_cache: Optional[CalendarEventCache] = None
+
+
+def get_event_cache() -> CalendarEventCache:
+    global _event_cache
+    if _event_cache is None:
+        _event_cache = CalendarEventCache()
+    return _event_cache
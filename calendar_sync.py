@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+tasks.csvとGoogleカレンダーの双方向同期
+
+タスクと予定をそれぞれ calendar_event_id → 内容 の辞書にして突き合わせ、
+差分だけをバッチリクエスト（CALENDAR_BATCH_SIZE件ずつ）で送る。
+前回同期した時点の内容の指紋を CALENDAR_SYNC_STATE_FILE に残しておき、
+どちら側が変わったかを判定する（両方変わっていればタスク側を優先）。
+
+- 予定のない未完了タスク（期限あり）: 終日の予定を作成
+- タスク側だけ変更: 予定を更新（完了したタスクは予定のタイトルに「✅ 」を付ける）
+- 予定側だけ変更: タイトル・日付・完了（「✅ 」の有無）をタスクに反映
+- 予定が削除された: タスクを完了扱いにする
+
+使い方: python calendar_sync.py
+"""
+
+import os
+import sys
+import json
+import hashlib
+import datetime
+from typing import Dict, List, Optional, Tuple
+
+from googleapiclient.errors import HttpError
+
+import task_store
+from calendar_cache import get_calendar_service, get_event_cache, new_batch_request
+
+CALENDAR_BATCH_SIZE = int(os.getenv("CALENDAR_BATCH_SIZE", "50"))
+CALENDAR_SYNC_STATE_FILE = os.getenv("CALENDAR_SYNC_STATE_FILE", "cache/calendar_sync.json")
+DONE_PREFIX = "✅ "
+
+# (タイトル, 日付, 完了か)
+TaskState = Tuple[str, str, bool]
+
+
+def task_state(task: Dict[str, str]) -> TaskState:
+    return (task["task_name"], task["due_date"], task["status"] == "done")
+
+
+def event_state(event: Dict) -> TaskState:
+    summary = event.get("summary", "")
+    done = summary.startswith(DONE_PREFIX)
+    if done:
+        summary = summary[len(DONE_PREFIX):]
+    start = event.get("start", {})
+    date = start.get("date") or start.get("dateTime", "")[:10]
+    return (summary, date, done)
+
+
+def fingerprint(state: TaskState) -> str:
+    return hashlib.sha1(json.dumps(state, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def event_body(task: Dict[str, str]) -> Dict:
+    """タスクを終日の予定にする（endは翌日）"""
+    name, due_date, done = task_state(task)
+    end_date = (datetime.date.fromisoformat(due_date) + datetime.timedelta(days=1)).isoformat()
+    return {
+        "summary": f"{DONE_PREFIX}{name}" if done else name,
+        "start": {"date": due_date},
+        "end": {"date": end_date},
+        "extendedProperties": {"private": {"todo_app": "1"}},
+    }
+
+
+def _load_state() -> Dict[str, str]:
+    try:
+        with open(CALENDAR_SYNC_STATE_FILE, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_state(state: Dict[str, str]) -> None:
+    os.makedirs(os.path.dirname(CALENDAR_SYNC_STATE_FILE) or ".", exist_ok=True)
+    tmp_file = f"{CALENDAR_SYNC_STATE_FILE}.tmp"
+    with open(tmp_file, "w", encoding="utf-8") as file:
+        json.dump(state, file)
+    os.replace(tmp_file, CALENDAR_SYNC_STATE_FILE)
+
+
+def _is_valid_date(value: str) -> bool:
+    try:
+        datetime.date.fromisoformat(value)
+        return True
+    except ValueError:
+        return False
+
+
+def execute_batched(service, requests: List[Tuple[str, object]]) -> Tuple[Dict[str, Dict], Dict[str, Exception]]:
+    """
+    (リクエストID, HttpRequest)のリストをCALENDAR_BATCH_SIZE件ずつまとめて実行する
+
+    戻り値は (ID → 応答, ID → エラー)。1件の失敗でバッチ全体は止めない。
+    バッチ自体が失敗した（通信・認証エラーなど）場合は残りを送らず、
+    未送信分をそのエラーで失敗扱いにして、それまでの応答と一緒に返す。
+    """
+    responses: Dict[str, Dict] = {}
+    errors: Dict[str, Exception] = {}
+
+    def callback(request_id, response, exception):
+        if exception is not None:
+            errors[request_id] = exception
+        else:
+            responses[request_id] = response
+
+    for start in range(0, len(requests), CALENDAR_BATCH_SIZE):
+        batch = new_batch_request(service, callback)
+        for request_id, request in requests[start:start + CALENDAR_BATCH_SIZE]:
+            batch.add(request, request_id=request_id)
+        try:
+            batch.execute()
+        except Exception as e:
+            for request_id, _ in requests[start:]:
+                if request_id not in responses:
+                    errors.setdefault(request_id, e)
+            break
+    return responses, errors
+
+
+def _fetch_missing(service, calendar_id: str, event_ids: List[str]) -> Tuple[Dict[str, Dict], List[str]]:
+    """
+    キャッシュにない予定（同期期間より古いものなど）をバッチでまとめて取得する
+
+    戻り値は (ID → 予定, 削除済みのIDのリスト)
+    """
+    events = service.events()
+    requests = [(event_id, events.get(calendarId=calendar_id, eventId=event_id)) for event_id in event_ids]
+    responses, errors = execute_batched(service, requests)
+    found = {}
+    deleted = []
+    for event_id in event_ids:
+        event = responses.get(event_id)
+        if event is not None and event.get("status") != "cancelled":
+            found[event_id] = event
+        elif event is not None or (isinstance(errors.get(event_id), HttpError) and errors[event_id].resp.status in (404, 410)):
+            deleted.append(event_id)
+    return found, deleted
+
+
+def sync_tasks_with_calendar(service=None, calendar_id: str = "primary") -> Optional[Dict[str, int]]:
+    """
+    タスクと予定を同期して件数を返す。カレンダーが使えなければNone
+
+    キーは created / pushed / pulled / completed / failed。
+    """
+    service = service or get_calendar_service()
+    if service is None:
+        return None
+    event_cache = get_event_cache()
+    event_cache.sync(service, force=True)
+
+    repository = task_store.get_repository()
+    # all()はコピーを返すので、途中で失敗してもリポジトリのキャッシュは変わらない
+    tasks = repository.all()
+    events_by_id: Dict[str, Dict] = dict(event_cache.events)
+    tasks_by_event_id: Dict[str, int] = {}
+    for i, task in enumerate(tasks):
+        if task["calendar_event_id"]:
+            tasks_by_event_id[task["calendar_event_id"]] = i
+    synced = _load_state()
+    stats = {"created": 0, "pushed": 0, "pulled": 0, "completed": 0, "failed": 0}
+
+    missing = [event_id for event_id in tasks_by_event_id if event_id not in events_by_id]
+    deleted: List[str] = []
+    if missing:
+        found, deleted = _fetch_missing(service, calendar_id, missing)
+        events_by_id.update(found)
+
+    changed_tasks = False
+    for event_id in deleted:
+        task = tasks[tasks_by_event_id.pop(event_id)]
+        if task["status"] != "done":
+            task["status"] = "done"
+            stats["completed"] += 1
+        task["calendar_event_id"] = ""
+        synced.pop(event_id, None)
+        changed_tasks = True
+
+    events = service.events()
+    requests: List[Tuple[str, object]] = []
+    pending_creates: Dict[str, int] = {}
+    for event_id, i in tasks_by_event_id.items():
+        event = events_by_id.get(event_id)
+        if event is None:
+            # 取得に失敗した予定は次回に回す
+            continue
+        task = tasks[i]
+        local = task_state(task)
+        remote = event_state(event)
+        if local == remote:
+            synced[event_id] = fingerprint(local)
+            continue
+        base = synced.get(event_id)
+        if base is not None and fingerprint(local) == base:
+            name, due_date, done = remote
+            task["task_name"] = name
+            if _is_valid_date(due_date):
+                task["due_date"] = due_date
+            task["status"] = "done" if done else "todo"
+            synced[event_id] = fingerprint(task_state(task))
+            stats["pulled"] += 1
+            changed_tasks = True
+        elif _is_valid_date(task["due_date"]):
+            requests.append((f"patch:{event_id}", events.patch(calendarId=calendar_id, eventId=event_id, body=event_body(task))))
+
+    for i, task in enumerate(tasks):
+        if not task["calendar_event_id"] and task["status"] != "done" and _is_valid_date(task["due_date"]):
+            request_id = f"create:{i}"
+            pending_creates[request_id] = i
+            requests.append((request_id, events.insert(calendarId=calendar_id, body=event_body(task))))
+
+    responses, errors = execute_batched(service, requests) if requests else ({}, {})
+    for request_id, event in responses.items():
+        kind, key = request_id.split(":", 1)
+        if kind == "create":
+            task = tasks[pending_creates[request_id]]
+            task["calendar_event_id"] = event["id"]
+            changed_tasks = True
+            stats["created"] += 1
+        else:
+            task = tasks[tasks_by_event_id[key]]
+            stats["pushed"] += 1
+        synced[event["id"]] = fingerprint(task_state(task))
+        event_cache.apply_event(event)
+    stats["failed"] = len(errors)
+    for request_id, error in errors.items():
+        print(f"カレンダー同期エラー ({request_id}): {error}")
+
+    if changed_tasks:
+        # 変更は1回の書き込みにまとめる
+        repository.replace_all(tasks)
+    _save_state(synced)
+    return stats
+
+
+def format_sync_stats(stats: Dict[str, int]) -> str:
+    return (f"作成 {stats['created']} / 予定へ反映 {stats['pushed']} / タスクへ反映 {stats['pulled']} / "
+            f"削除→完了 {stats['completed']} / 失敗 {stats['failed']}")
+
+
+def main() -> None:
+    task_store.initialize_store()
+    stats = sync_tasks_with_calendar()
+    if stats is None:
+        print("認証ファイルなし")
+        sys.exit(1)
+    print(format_sync_stats(stats))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会話履歴（ひろゆきモード・RAGモード）の全文検索
+
+質問と回答を文字bigramの転置インデックスにして cache/conversation_index.pkl に保存する。
+検索のたびにログの増えた分（現在のCSVは前回読んだ位置から、アーカイブは新しいセグメントだけ）を
+追加するので、全件を読み直すのは初回だけ。
+スコアは一致したbigramのIDFの合計をクエリ全体のIDFで割ったもの（出現の多すぎるbigramは
+より珍しいbigramがあれば無視する）に、質問・回答に語句がそのまま含まれる場合の加点を足す。
+
+使い方: python conversation_search.py 外国税額控除 [--source rag] [--limit 10]
+"""
+
+import io
+import os
+import csv
+import math
+import heapq
+import pickle
+import hashlib
+import argparse
+import threading
+from array import array
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+import log_archive
+import log_writer
+from task_matcher import char_ngrams, normalize_text
+
+CONVERSATION_INDEX_FILE = os.getenv("CONVERSATION_INDEX_FILE", "cache/conversation_index.pkl")
+# 文書の何割以上に出てくるbigramを「ありふれたもの」とみなすか
+COMMON_GRAM_RATIO = float(os.getenv("CONVERSATION_COMMON_GRAM_RATIO", "0.2"))
+
+# ソース名 → (ログファイル, 日時の列, 質問の列, 回答の列, 補足の列)
+SOURCES: Dict[str, Tuple[str, str, str, str, str]] = {
+    "hiroyuki": ("csv/simple_conversations.csv", "datetime", "user_input", "ai_response", ""),
+    "rag": ("rag_conversations.csv", "timestamp", "question", "answer", "pdf_file"),
+}
+
+# (ソース名, 日時, 質問, 回答, 補足)
+Record = Tuple[str, str, str, str, str]
+
+
+class ConversationIndex:
+    """会話履歴の文字bigram転置インデックス（差分更新・ファイルに保存）"""
+
+    def __init__(self, index_file: str = CONVERSATION_INDEX_FILE):
+        self.index_file = index_file
+        self.docs: List[Record] = []
+        self.postings: Dict[str, array] = defaultdict(lambda: array('I'))
+        self._keys: Set[bytes] = set()
+        # ソース名 → 取り込み済みのセグメント名
+        self._segments: Dict[str, Set[str]] = defaultdict(set)
+        # ソース名 → (inode, 読み終えたバイト位置, ヘッダー)
+        self._live: Dict[str, Tuple[int, int, List[str]]] = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            with open(self.index_file, 'rb') as file:
+                state = pickle.load(file)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return
+        self.docs = state["docs"]
+        self.postings.update(state["postings"])
+        self._keys = state["keys"]
+        self._segments.update(state["segments"])
+        self._live = state["live"]
+
+    def _save(self) -> None:
+        os.makedirs(os.path.dirname(self.index_file) or ".", exist_ok=True)
+        tmp_file = f"{self.index_file}.tmp"
+        with open(tmp_file, 'wb') as file:
+            pickle.dump({
+                "docs": self.docs, "postings": dict(self.postings), "keys": self._keys,
+                "segments": dict(self._segments), "live": self._live,
+            }, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_file, self.index_file)
+
+    def add(self, record: Record) -> bool:
+        """1件追加する。同じ記録（ローテーション前に読んだ行など）は二重に入れない"""
+        key = hashlib.blake2b("\0".join(record).encode('utf-8'), digest_size=16).digest()
+        if key in self._keys:
+            return False
+        self._keys.add(key)
+        doc_id = len(self.docs)
+        self.docs.append(record)
+        for gram in char_ngrams(f"{record[2]}\n{record[3]}"):
+            self.postings[gram].append(doc_id)
+        return True
+
+    def _add_row(self, source: str, row: Dict[str, str]) -> bool:
+        _, time_column, question_column, answer_column, extra_column = SOURCES[source]
+        return self.add((source, row.get(time_column) or "", row.get(question_column) or "",
+                         row.get(answer_column) or "", row.get(extra_column) or "" if extra_column else ""))
+
+    def _refresh_source(self, source: str) -> int:
+        log_path = SOURCES[source][0]
+        added = 0
+        columns = [column for column in SOURCES[source][1:] if column]
+        for segment_path in log_archive.list_segments(log_path):
+            name = os.path.basename(segment_path)
+            if name in self._segments[source]:
+                continue
+            data = log_archive.read_segment_columns(segment_path, columns)
+            for values in zip(*(data[column] for column in columns)):
+                added += self._add_row(source, dict(zip(columns, values)))
+            self._segments[source].add(name)
+
+        try:
+            stat = os.stat(log_path)
+        except FileNotFoundError:
+            self._live.pop(source, None)
+            return added
+        inode, offset, header = self._live.get(source, (stat.st_ino, 0, []))
+        if inode != stat.st_ino or stat.st_size < offset:
+            # ローテーションされた（読んだ分はセグメント側にあり、重複は除かれる）
+            offset, header = 0, []
+        if stat.st_size == offset:
+            return added
+        with open(log_path, 'rb') as file:
+            file.seek(offset)
+            data = file.read()
+        # 書き込み途中の末尾行は次回に回す
+        end = data.rfind(b"\n") + 1
+        reader = csv.reader(io.StringIO(data[:end].decode('utf-8'), newline=''))
+        if not header:
+            header = next(reader, [])
+        for row in reader:
+            added += self._add_row(source, dict(zip(header, row)))
+        self._live[source] = (stat.st_ino, offset + end, header)
+        return added
+
+    def refresh(self) -> int:
+        """ログの増えた分を取り込み、追加した件数を返す"""
+        log_writer.flush_if_started()
+        with self._lock:
+            added = sum(self._refresh_source(source) for source in SOURCES)
+            if added:
+                self._save()
+            return added
+
+    def _top_candidates(self, weighted: List[Tuple[str, float]], limit: int, source: Optional[str]) -> List[Tuple[int, float]]:
+        """転置リストを走査して(doc_id, スコア)の上位limit件を返す"""
+        if NUMPY_AVAILABLE:
+            # 転置リストを連結してbincountで一度に集計する（Pythonのループを回さない）
+            postings = [np.frombuffer(self.postings[gram], dtype=np.uint32) for gram, _ in weighted]
+            doc_ids = np.concatenate(postings)
+            weights = np.repeat([weight for _, weight in weighted], [len(posting) for posting in postings])
+            totals = np.bincount(doc_ids, weights=weights, minlength=len(self.docs))
+            candidates = np.flatnonzero(totals)
+            order = candidates[np.argsort(-totals[candidates], kind="stable")]
+            top = []
+            for doc_id in order:
+                if source and self.docs[doc_id][0] != source:
+                    continue
+                top.append((int(doc_id), float(totals[doc_id])))
+                if len(top) >= limit:
+                    break
+            return top
+        scores: Dict[int, float] = defaultdict(float)
+        for gram, weight in weighted:
+            for doc_id in self.postings[gram]:
+                scores[doc_id] += weight
+        if source:
+            scores = {doc_id: score for doc_id, score in scores.items() if self.docs[doc_id][0] == source}
+        return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+    def search(self, query: str, limit: int = 10, source: Optional[str] = None) -> List[Dict]:
+        """スコアの高い順に最大limit件返す"""
+        grams = char_ngrams(query)
+        total = len(self.docs)
+        if not grams or not total:
+            return []
+        weighted = sorted(
+            ((gram, math.log(1 + total / len(self.postings[gram]))) for gram in grams if gram in self.postings),
+            key=lambda item: -item[1]
+        )
+        if not weighted:
+            return []
+        query_weight = sum(math.log(1 + total) for _ in grams)
+        common_limit = max(total * COMMON_GRAM_RATIO, 1)
+        rare = [(gram, weight) for gram, weight in weighted if len(self.postings[gram]) <= common_limit]
+        top = self._top_candidates(rare or weighted, limit * 3, source)
+
+        phrase = normalize_text(query)
+        results = []
+        for doc_id, score in top:
+            record = self.docs[doc_id]
+            score /= query_weight
+            if phrase in normalize_text(record[2]):
+                score += 1.0
+            elif phrase in normalize_text(record[3]):
+                score += 0.5
+            results.append({"score": round(score, 4), "doc_id": doc_id, "source": record[0], "timestamp": record[1],
+                             "question": record[2], "answer": record[3], "extra": record[4]})
+        results.sort(key=lambda result: (-result["score"], -result["doc_id"]))
+        return results[:limit]
+
+
+_conversation_index: Optional[ConversationIndex] = None
+
+
+def search_conversations(query: str, limit: int = 10, source: Optional[str] = None) -> List[Dict]:
+    """差分を取り込んでから検索する"""
+    global _conversation_index
+    if _conversation_index is None:
+        _conversation_index = ConversationIndex()
+    _conversation_index.refresh()
+    return _conversation_index.search(query, limit, source)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("query")
+    parser.add_argument("--source", choices=list(SOURCES))
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    results = search_conversations(args.query, args.limit, args.source)
+    if not results:
+        print("該当する会話はありません")
+        return
+    for result in results:
+        extra = f" [{result['extra']}]" if result["extra"] else ""
+        answer = result["answer"].replace("\n", " ")
+        print(f"{result['score']:.2f} {result['timestamp']} ({result['source']}){extra}")
+        print(f"  Q: {result['question']}")
+        print(f"  A: {answer[:120]}{'…' if len(answer) > 120 else ''}")
+
+
+if __name__ == "__main__":
+    main()
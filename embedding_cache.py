@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+    from llama_index.core.base.embeddings.base import BaseEmbedding
+    from llama_index.core.bridge.pydantic import PrivateAttr
+    EMBEDDING_CACHE_AVAILABLE = True
+except ImportError:
+    EMBEDDING_CACHE_AVAILABLE = False
+
+from rag_cache import RAG_CACHE_DIR
+
+_DIGEST_SIZE = 32
+_VECTORS_FILE = "vectors.f32"
+_KEYS_FILE = "keys.bin"
+_META_FILE = "meta.json"
+
+
+class EmbeddingCache:
+    """
+    チャンク本文のハッシュをキーにした埋め込みベクトルのキャッシュ
+
+    ベクトルはfloat32の固定長レコードとしてvectors.f32に追記し、numpyのmemmapで参照する。
+    メモリに載せるのはキー（SHA-256ダイジェスト）→行番号の辞書だけなので、
+    キャッシュ全体がRAMに収まらなくても使える。取得結果はmemmapのビュー（コピーなし）。
+    keys.binにはベクトルを書き終えてからダイジェストを追記するので、
+    途中で落ちてもキーが存在しないベクトルを指すことはない。
+    """
+
+    def __init__(self, model_name: str, cache_dir: Optional[str] = None):
+        self.model_name = model_name
+        model_key = hashlib.sha256(model_name.encode('utf-8')).hexdigest()[:16]
+        self.cache_dir = cache_dir or os.path.join(RAG_CACHE_DIR, "embeddings", model_key)
+        self._lock = threading.Lock()
+        self._rows: Dict[bytes, int] = {}
+        self._dim: Optional[int] = None
+        self._vectors = None
+        self._mapped_rows = 0
+        self._open()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.cache_dir, name)
+
+    def _open(self) -> None:
+        try:
+            with open(self._path(_META_FILE), 'r', encoding='utf-8') as file:
+                self._dim = json.load(file)["dim"]
+        except (FileNotFoundError, json.JSONDecodeError, KeyError):
+            return
+        try:
+            with open(self._path(_KEYS_FILE), 'rb') as file:
+                keys = file.read()
+        except FileNotFoundError:
+            keys = b""
+        vector_bytes = os.path.getsize(self._path(_VECTORS_FILE)) if os.path.exists(self._path(_VECTORS_FILE)) else 0
+        rows = min(len(keys) // _DIGEST_SIZE, vector_bytes // (4 * self._dim))
+        # 書き込み途中で切れた末尾を切り詰める
+        if len(keys) != rows * _DIGEST_SIZE:
+            with open(self._path(_KEYS_FILE), 'r+b') as file:
+                file.truncate(rows * _DIGEST_SIZE)
+        if vector_bytes != rows * 4 * self._dim:
+            with open(self._path(_VECTORS_FILE), 'r+b') as file:
+                file.truncate(rows * 4 * self._dim)
+        for row in range(rows):
+            self._rows[keys[row * _DIGEST_SIZE:(row + 1) * _DIGEST_SIZE]] = row
+
+    def _digest(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode('utf-8')).digest()
+
+    def _remap(self) -> None:
+        rows = len(self._rows)
+        if rows == 0:
+            self._vectors = None
+        else:
+            self._vectors = np.memmap(self._path(_VECTORS_FILE), dtype=np.float32, mode='r', shape=(rows, self._dim))
+        self._mapped_rows = rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def get(self, text: str):
+        """キャッシュ済みならmemmap上のベクトル（読み取り専用ビュー）、なければNone"""
+        with self._lock:
+            row = self._rows.get(self._digest(text))
+            if row is None:
+                return None
+            if row >= self._mapped_rows:
+                self._remap()
+            return self._vectors[row]
+
+    def put_many(self, texts: List[str], embeddings: List[List[float]]) -> None:
+        if not texts:
+            return
+        with self._lock:
+            pending = []
+            for text, embedding in zip(texts, embeddings):
+                digest = self._digest(text)
+                if digest not in self._rows:
+                    pending.append((digest, embedding))
+            if not pending:
+                return
+            vectors = np.asarray([embedding for _, embedding in pending], dtype=np.float32)
+            if self._dim is None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                self._dim = vectors.shape[1]
+                with open(self._path(_META_FILE), 'w', encoding='utf-8') as file:
+                    json.dump({"model": self.model_name, "dim": self._dim}, file, ensure_ascii=False)
+            if vectors.shape[1] != self._dim:
+                return
+            with open(self._path(_VECTORS_FILE), 'ab') as file:
+                file.write(vectors.tobytes())
+            with open(self._path(_KEYS_FILE), 'ab') as file:
+                file.write(b"".join(digest for digest, _ in pending))
+            for digest, _ in pending:
+                self._rows[digest] = len(self._rows)
+
+
+if EMBEDDING_CACHE_AVAILABLE:
+    class CachedEmbedding(BaseEmbedding):
+        """既存の埋め込みモデルをラップし、未キャッシュのチャンクだけを埋め込む"""
+
+        _inner: Any = PrivateAttr()
+        _cache: Any = PrivateAttr()
+
+        def __init__(self, inner: BaseEmbedding, cache: Optional[EmbeddingCache] = None, **kwargs: Any):
+            model_name = getattr(inner, "model_name", "") or type(inner).__name__
+            super().__init__(model_name=model_name, embed_batch_size=inner.embed_batch_size, **kwargs)
+            self._inner = inner
+            self._cache = cache or EmbeddingCache(model_name)
+
+        @classmethod
+        def class_name(cls) -> str:
+            return "CachedEmbedding"
+
+        def _get_query_embedding(self, query: str) -> List[float]:
+            return self._inner.get_query_embedding(query)
+
+        async def _aget_query_embedding(self, query: str) -> List[float]:
+            return await self._inner.aget_query_embedding(query)
+
+        def _get_text_embedding(self, text: str) -> List[float]:
+            return self._get_text_embeddings([text])[0]
+
+        def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+            results: List[Optional[List[float]]] = []
+            missing = []
+            for i, text in enumerate(texts):
+                cached = self._cache.get(text)
+                if cached is None:
+                    missing.append(i)
+                    results.append(None)
+                else:
+                    results.append(cached.tolist())
+            if missing:
+                missing_texts = [texts[i] for i in missing]
+                embeddings = self._inner.get_text_embedding_batch(missing_texts)
+                self._cache.put_many(missing_texts, embeddings)
+                for i, embedding in zip(missing, embeddings):
+                    results[i] = embedding
+            return results
+
+
+def with_embedding_cache(embed_model):
+    """Settings.embed_modelをキャッシュ付きに差し替えるためのヘルパー"""
+    if not EMBEDDING_CACHE_AVAILABLE or isinstance(embed_model, CachedEmbedding):
+        return embed_model
+    return CachedEmbedding(embed_model)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Google Calendar API（events）のインメモリなフェイクサーバー
+
+calendar_cacheの差分同期を本物のアカウントなしで試すためのもの。
+events.list（ページング・syncToken・削除予定のcancelled返却）と
+insert / get / patch / update / delete、およびそれらをまとめた
+バッチリクエスト（POST /batch/calendar/v3、multipart/mixed）に対応する。
+state.request_countはHTTPの往復回数（バッチは1回と数える）。
+
+使い方:
+    python fake_calendar_server.py --port 8765
+    CALENDAR_API_ENDPOINT=http://127.0.0.1:8765/calendar/v3/ python main.py
+"""
+
+import json
+import uuid
+import argparse
+import threading
+from email.parser import Parser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+
+class FakeCalendarState:
+    """
+    予定の保存先。変更のたびに通し番号（seq）を振り、syncTokenはその番号にする
+
+    syncToken付きのlistでは、その番号より後に変更された予定（削除済みを含む）を返す。
+    expire_sync_tokens()を呼ぶと、それ以前に発行したトークンは410 Goneになる。
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seq = 0
+        self.min_valid_seq = 0
+        self.request_count = 0
+        # カレンダーID → {予定ID: (変更番号, 予定)}
+        self.calendars: Dict[str, Dict[str, Tuple[int, Dict]]] = {}
+
+    def _events(self, calendar_id: str) -> Dict[str, Tuple[int, Dict]]:
+        return self.calendars.setdefault(calendar_id, {})
+
+    def put_event(self, calendar_id: str, event: Dict) -> Dict:
+        with self.lock:
+            self.seq += 1
+            event = dict(event)
+            event.setdefault('id', uuid.uuid4().hex)
+            event.setdefault('status', 'confirmed')
+            event['etag'] = f'"{self.seq}"'
+            self._events(calendar_id)[event['id']] = (self.seq, event)
+            return event
+
+    def get_event(self, calendar_id: str, event_id: str) -> Optional[Dict]:
+        with self.lock:
+            entry = self._events(calendar_id).get(event_id)
+            if entry is None or entry[1].get('status') == 'cancelled':
+                return None
+            return entry[1]
+
+    def delete_event(self, calendar_id: str, event_id: str) -> bool:
+        event = self.get_event(calendar_id, event_id)
+        if event is None:
+            return False
+        self.put_event(calendar_id, {'id': event_id, 'status': 'cancelled'})
+        return True
+
+    def expire_sync_tokens(self) -> None:
+        with self.lock:
+            self.min_valid_seq = self.seq + 1
+
+    def list_events(self, calendar_id: str, params: Dict[str, str]) -> Tuple[int, Dict]:
+        page_size = int(params.get('maxResults', '250'))
+        offset = int(params.get('pageToken', '0'))
+        with self.lock:
+            sync_token = params.get('syncToken')
+            if sync_token is not None:
+                since = int(sync_token)
+                if since < self.min_valid_seq:
+                    return 410, _error_body(410, "Sync token is no longer valid, a full sync is required.")
+                entries = [e for seq, e in self._events(calendar_id).values() if seq > since]
+            else:
+                time_min = params.get('timeMin', '')
+                entries = [e for _, e in self._events(calendar_id).values()
+                           if e.get('status') != 'cancelled' and _start_key(e) >= time_min[:10]]
+            entries.sort(key=lambda e: (_start_key(e), e['id']))
+            page = entries[offset:offset + page_size]
+            body = {'kind': 'calendar#events', 'items': page}
+            if offset + page_size < len(entries):
+                body['nextPageToken'] = str(offset + page_size)
+            else:
+                body['nextSyncToken'] = str(self.seq)
+            return 200, body
+
+
+def _start_key(event: Dict) -> str:
+    start = event.get('start', {})
+    return start.get('dateTime') or start.get('date') or ''
+
+
+def _error_body(status: int, message: str) -> Dict:
+    return {'error': {'code': status, 'message': message, 'errors': [{'message': message}]}}
+
+
+def handle_request(state: FakeCalendarState, method: str, path: str, query: Dict[str, str],
+                   body: Optional[Dict]) -> Tuple[int, Optional[Dict]]:
+    """1件のAPIリクエストを処理して(ステータス, JSON本文)を返す"""
+    parts = [unquote(p) for p in path.split('/') if p]
+    if 'calendars' not in parts:
+        return 404, _error_body(404, "Not Found")
+    parts = parts[parts.index('calendars') + 1:]
+    if len(parts) < 2 or parts[1] != 'events':
+        return 404, _error_body(404, "Not Found")
+    calendar_id = parts[0]
+    event_id = parts[2] if len(parts) > 2 else None
+
+    if event_id is None:
+        if method == 'GET':
+            return state.list_events(calendar_id, query)
+        if method == 'POST':
+            return 200, state.put_event(calendar_id, {k: v for k, v in (body or {}).items() if k != 'id'})
+        return 405, _error_body(405, "Method Not Allowed")
+
+    current = state.get_event(calendar_id, event_id)
+    if current is None:
+        return 404, _error_body(404, "Not Found")
+    if method == 'GET':
+        return 200, current
+    if method == 'PATCH':
+        return 200, state.put_event(calendar_id, {**current, **(body or {}), 'id': event_id})
+    if method == 'PUT':
+        return 200, state.put_event(calendar_id, {**(body or {}), 'id': event_id})
+    if method == 'DELETE':
+        state.delete_event(calendar_id, event_id)
+        return 204, None
+    return 405, _error_body(405, "Method Not Allowed")
+
+
+def handle_batch(state: FakeCalendarState, content_type: str, raw: str) -> Tuple[str, str]:
+    """multipart/mixedのバッチを1件ずつ処理し、(Content-Type, 本文)を返す"""
+    message = Parser().parsestr(f"Content-Type: {content_type}\r\n\r\n{raw}")
+    boundary = f"batch_{uuid.uuid4().hex}"
+    chunks = []
+    for part in message.get_payload():
+        payload = part.get_payload().replace('\r\n', '\n')
+        request_line, rest = payload.split('\n', 1)
+        method, target, _ = request_line.split(' ', 2)
+        body_text = rest.split('\n\n', 1)[1] if '\n\n' in rest else ''
+        url = urlparse(target)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        body = json.loads(body_text) if body_text.strip() else None
+        status, response = handle_request(state, method, url.path, query, body)
+        # 長いContent-IDは折り返されて届くので1行に戻す
+        content_id = " ".join(part.get('Content-ID', '<+>').split())
+        response_text = json.dumps(response, ensure_ascii=False) if response is not None else ''
+        chunks.append(
+            f"--{boundary}\r\nContent-Type: application/http\r\nContent-ID: <response-{content_id[1:]}\r\n\r\n"
+            f"HTTP/1.1 {status} {'OK' if status < 300 else 'Error'}\r\n"
+            f"Content-Type: application/json; charset=UTF-8\r\n\r\n{response_text}\r\n"
+        )
+    chunks.append(f"--{boundary}--\r\n")
+    return f"multipart/mixed; boundary={boundary}", "".join(chunks)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    state: FakeCalendarState = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length', '0'))
+        return self.rfile.read(length) if length else b''
+
+    def _send(self, status: int, body: Optional[Dict]) -> None:
+        payload = json.dumps(body, ensure_ascii=False).encode('utf-8') if body is not None else b''
+        self.send_response(status)
+        if body is not None:
+            self.send_header('Content-Type', 'application/json; charset=UTF-8')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _dispatch(self) -> None:
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        raw = self._read_body()
+        with self.state.lock:
+            self.state.request_count += 1
+        if self.command == 'POST' and url.path.rstrip('/').endswith('/batch/calendar/v3'):
+            content_type, text = handle_batch(self.state, self.headers.get('Content-Type', ''), raw.decode('utf-8'))
+            payload = text.encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+            return
+        try:
+            body = json.loads(raw) if raw else None
+        except json.JSONDecodeError:
+            self._send(400, _error_body(400, "Invalid JSON"))
+            return
+        status, response = handle_request(self.state, self.command, url.path, query, body)
+        self._send(status, response)
+
+    do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _dispatch
+
+
+class FakeCalendarServer:
+    """バックグラウンドスレッドで動くフェイクサーバー（port=0なら空いているポートを使う）"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0):
+        self.state = FakeCalendarState()
+        handler = type('FakeCalendarHandler', (_Handler,), {'state': self.state})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """CALENDAR_API_ENDPOINTに設定する値"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/calendar/v3/"
+
+    def start(self) -> "FakeCalendarServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-calendar", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def add_event(self, summary: str, start: str, calendar_id: str = 'primary', **fields) -> Dict:
+        """startは'YYYY-MM-DD'（終日）か'YYYY-MM-DDTHH:MM:SS+09:00'"""
+        key = 'dateTime' if 'T' in start else 'date'
+        return self.state.put_event(calendar_id, {'summary': summary, 'start': {key: start}, 'end': {key: start}, **fields})
+
+    def events(self, calendar_id: str = 'primary') -> List[Dict]:
+        with self.state.lock:
+            return [e for _, e in self.state._events(calendar_id).values() if e.get('status') != 'cancelled']
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    server = FakeCalendarServer(args.host, args.port)
+    print(f"フェイクCalendarサーバー起動: CALENDAR_API_ENDPOINT={server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
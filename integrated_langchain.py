@@ -1,143 +1,57 @@
 #!/usr/bin/env python3
 import os
-import sys
-
-# pyopenjtalk を直接使用（ワーカーモード無効）
-# 環境に応じたパス自動検出（Googleコラボとローカル両対応）
-if os.path.exists('/content/drive/MyDrive/todo-app/Style-Bert-VITS2'):
-    _style_bert_root = '/content/drive/MyDrive/todo-app/Style-Bert-VITS2'
-else:
-    _style_bert_root = '/Users/yoshinomukanou/todo-app/Style-Bert-VITS2'
-_tts_initialized = False
-
-os.environ["PYOPENJTALK_G2P_WORKER"] = "0"
-
-if os.path.exists(_style_bert_root):
-    sys.path.insert(0, _style_bert_root)
-    _orig = os.getcwd()
-    os.chdir(_style_bert_root)
-    print("[TTS] 初期化開始...")
-    try:
-        import pyopenjtalk
-        from style_bert_vits2.nlp.japanese.user_dict import update_dict
-        update_dict()
-        _tts_initialized = True
-        print("[TTS] 初期化完了")
-    except Exception as e:
-        print(f"[TTS] 初期化失敗: {type(e).__name__}: {e}")
-    finally:
-        os.chdir(_orig)
-
+import re
 import csv
+import asyncio
 import datetime
 import json
-import pickle
-import traceback
-from typing import Dict, List, Tuple
-from langchain_openai import ChatOpenAI
+from typing import Callable, Dict, List, Optional, Tuple
 from langchain_core.messages import HumanMessage, SystemMessage
 from langchain_core.tools import tool
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
 from dotenv import load_dotenv
+import task_store
+from calendar_cache import get_event_cache
+from llm_clients import get_chat_llm, run_async
+from log_writer import get_log_writer
+from tts_worker import STYLE_BERT_ROOT, AudioCache, TTSProcess, TTSWorker
+from response_cache import get_response_cache, make_cache_key
 
 load_dotenv()
 
+# 1ならLLMの出力をトークン単位で逐次表示する
+STREAM_OUTPUT = os.getenv("STREAM_OUTPUT", "1") != "0"
+
 _tts_available = False
-_tts_model = None
-_audio_counter = 0
+_tts_process = None
+_tts_worker = None
 
 try:
-    from model_load import load_model
     from IPython.display import Audio, display
-    _tts_available = True
-    print("[TTS] モジュールインポート成功")
+    _tts_available = os.path.exists(STYLE_BERT_ROOT)
+    if not _tts_available:
+        print(f"[TTS] Style-Bert-VITS2ディレクトリが見つかりません: {STYLE_BERT_ROOT}")
 except ImportError as e:
     print(f"[TTS] インポート失敗: {e}")
     pass
 
-def _init_tts():
-    global _tts_initialized
-    if _tts_initialized or not _tts_available:
-        return
-    if not os.path.exists(_style_bert_root):
-        print(f"[TTS] Style-Bert-VITS2ディレクトリが見つかりません: {_style_bert_root}")
-        return
-    if sys.path[0] != _style_bert_root:
-        if _style_bert_root in sys.path:
-            sys.path.remove(_style_bert_root)
-        sys.path.insert(0, _style_bert_root)
-    original_cwd = os.getcwd()
-    try:
-        os.chdir(_style_bert_root)
-        import pyopenjtalk
-        from style_bert_vits2.nlp.japanese.user_dict import update_dict
-        update_dict()
-        _tts_initialized = True
-        print("[TTS] pyopenjtalk初期化完了")
-    except Exception as e:
-        print(f"[TTS] 初期化エラー: {type(e).__name__}: {e}")
-    finally:
-        os.chdir(original_cwd)
-
-def _get_tts_model():
-    global _tts_model
-    print(f"[TTS DEBUG] _get_tts_model開始: _tts_model={_tts_model}, _tts_available={_tts_available}")
-    if _tts_model is None and _tts_available:
-        print("[TTS DEBUG] _init_tts呼び出し")
-        _init_tts()
-        print(f"[TTS DEBUG] _init_tts完了: _tts_initialized={_tts_initialized}")
-        if not _tts_initialized:
-            print("[TTS DEBUG] 初期化失敗のためNone返却")
-            return None
-        original_cwd = os.getcwd()
-        try:
-            os.chdir(_style_bert_root)
-            print(f"[TTS DEBUG] load_model呼び出し: dir={_style_bert_root}", flush=True)
-            _tts_model = load_model("yoshino_test", model_dir=f"{_style_bert_root}/model_assets", device="cpu")
-            print(f"[TTS DEBUG] load_model完了: model={type(_tts_model)}", flush=True)
-        except Exception as e:
-            print(f"[TTS DEBUG] load_modelエラー: {type(e).__name__}: {e}")
-            traceback.print_exc()
-        finally:
-            os.chdir(original_cwd)
-    return _tts_model
-
-def speak_hiroyuki(text: str) -> str:
+def _play_audio(out_path: str) -> None:
+    display(Audio(out_path, autoplay=True))
+
+def _get_tts_worker() -> TTSWorker:
+    """TTSワーカープロセスを起動し（モデル読み込みはバックグラウンドで始まる）、再生パイプラインを返す"""
+    global _tts_process, _tts_worker
+    if _tts_worker is None:
+        _tts_process = TTSProcess()
+        _tts_worker = TTSWorker(_tts_process.synthesize, _play_audio, AudioCache())
+    return _tts_worker
+
+def speak_hiroyuki(text: str) -> None:
+    """読み上げをバックグラウンドのTTSワーカーに積んですぐに戻る（文単位で合成・再生）"""
     print(f"[TTS DEBUG] speak_hiroyuki開始: text長={len(text)}")
     if not _tts_available:
-        print("[TTS] model_load未インポート")
-        return ""
-    try:
-        global _audio_counter
-        _audio_counter += 1
-        audio_dir = _style_bert_root.replace('/Style-Bert-VITS2', '/audio')
-        os.makedirs(audio_dir, exist_ok=True)
-        out_path = f"{audio_dir}/hiroyuki_{_audio_counter}.wav"
-        print(f"[TTS DEBUG] 出力パス: {out_path}")
-        print(f"[TTS DEBUG] モデル取得中...", flush=True)
-        model = _get_tts_model()
-        print(f"[TTS DEBUG] モデル取得結果: {type(model)}", flush=True)
-        if model is None:
-            print("[TTS DEBUG] モデルがNoneのため終了", flush=True)
-            return ""
-        print(f"[TTS DEBUG] inference呼び出し: text={text[:50]}...", flush=True)
-        original_cwd = os.getcwd()
-        os.chdir(_style_bert_root)
-        try:
-            model.inference(text, out_path)
-        finally:
-            os.chdir(original_cwd)
-        print(f"[TTS DEBUG] inference完了: {out_path}", flush=True)
-        display(Audio(out_path, autoplay=True))
-        return out_path
-    except Exception as e:
-        print(f"[TTS DEBUG] エラー発生箇所のスタックトレース:")
-        traceback.print_exc()
-        print(f"[TTS] エラー: {type(e).__name__}: {e}")
-        return ""
+        print("[TTS] 利用不可")
+        return
+    _get_tts_worker().speak(text)
 
 def _ensure_hiroyuki_csv_exists():
     conversation_log = "csv/simple_conversations.csv"
@@ -148,14 +62,62 @@ def _ensure_hiroyuki_csv_exists():
             writer.writerow(['datetime', 'user_input', 'ai_response', 'response_length'])
 
 def _log_hiroyuki_conversation(user_input: str, ai_response: str):
+    """バッファに積むだけで、書き込みはlog_writerのスレッドがまとめて行う"""
     conversation_log = "csv/simple_conversations.csv"
-    with open(conversation_log, 'a', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow([datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), user_input, ai_response, len(ai_response)])
+    get_log_writer().write_row(
+        conversation_log,
+        [datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), user_input, ai_response, len(ai_response)],
+        header=['datetime', 'user_input', 'ai_response', 'response_length']
+    )
+
+async def _ainvoke_llm(llm, messages, on_token: Optional[Callable[[str], None]] = None) -> str:
+    """同じプロンプト・モデル・temperatureの応答はresponse_cacheから返す"""
+    cache = get_response_cache()
+    cache_key = make_cache_key([(message.type, message.content) for message in messages],
+                               getattr(llm, "model_name", ""), getattr(llm, "temperature", None))
+    cached = cache.get(cache_key)
+    if cached is not None:
+        if on_token is not None:
+            on_token(cached)
+        return cached
+    if on_token is None:
+        content = (await llm.ainvoke(messages)).content
+    else:
+        chunks = []
+        async for chunk in llm.astream(messages):
+            if chunk.content:
+                on_token(chunk.content)
+                chunks.append(chunk.content)
+        content = "".join(chunks)
+    cache.put(cache_key, content)
+    return content
+
+class _DeferredEmitter:
+    """先に表示する回答が終わるまでトークンを溜めておき、release後はそのまま流す"""
+
+    def __init__(self, on_token: Callable[[str], None]):
+        self.on_token = on_token
+        self.buffer: List[str] = []
+        self.released = False
+
+    def __call__(self, token: str) -> None:
+        if self.released:
+            self.on_token(token)
+        else:
+            self.buffer.append(token)
+
+    def release(self) -> None:
+        self.released = True
+        for token in self.buffer:
+            self.on_token(token)
+        self.buffer.clear()
 
-def get_hiroyuki_response(user_input: str) -> str:
+def get_hiroyuki_response(user_input: str, on_token: Optional[Callable[[str], None]] = None) -> str:
+    return run_async(aget_hiroyuki_response(user_input, on_token))
+
+async def aget_hiroyuki_response(user_input: str, on_token: Optional[Callable[[str], None]] = None) -> str:
     _ensure_hiroyuki_csv_exists()
-    llm = ChatOpenAI(temperature=0.7, model="openai/gpt-3.5-turbo", openai_api_base="https://openrouter.ai/api/v1", openai_api_key=os.getenv("OPENROUTER_API_KEY"))
+    llm = get_chat_llm("openai/gpt-3.5-turbo", 0.7)
     system_prompt = """あなたはひろゆき（西村博之）として回答してください。
 以下のルールを厳守してください：
 1. 主語は「おいら」を使用
@@ -167,13 +129,10 @@ def get_hiroyuki_response(user_input: str) -> str:
 
 例：「タスクを確認してきました。〜タスク〜やるべきことは多いですが、一つ一つ集中的に行うことが生産性を上げるって科学的に証明されてるんですよね、はい。まぁ、頑張ってください。」"""
     messages = [SystemMessage(content=system_prompt), HumanMessage(content=user_input)]
-    response = llm.invoke(messages)
-    ai_response = response.content
+    ai_response = await _ainvoke_llm(llm, messages, on_token)
     _log_hiroyuki_conversation(user_input, ai_response)
     return ai_response
 
-SCOPES = ['https://www.googleapis.com/auth/calendar']
-
 @tool("search_calendar_events")
 def search_calendar_events(query: str = "") -> str:
     """
@@ -185,29 +144,10 @@ def search_calendar_events(query: str = "") -> str:
     Returns:
         予定のリスト（最大10件）。日時とタイトルを含む文字列を返す
     """
-    creds = None
-    token_file = "config/token.pickle"
-    credentials_file = "config/credentials.json"
-    if os.path.exists(token_file):
-        with open(token_file, 'rb') as token:
-            creds = pickle.load(token)
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
-            creds.refresh(Request())
-        else:
-            if not os.path.exists(credentials_file):
-                return "認証ファイルなし"
-            flow = InstalledAppFlow.from_client_secrets_file(credentials_file, SCOPES)
-            creds = flow.run_local_server(port=0)
-        with open(token_file, 'wb') as token:
-            pickle.dump(creds, token)
-    service = build('calendar', 'v3', credentials=creds)
-    now = datetime.datetime.now()
-    time_min = now.isoformat() + '+09:00'
-    week_later = now + datetime.timedelta(days=7)
-    time_max = week_later.isoformat() + '+09:00'
-    events_result = service.events().list(calendarId='primary', timeMin=time_min, timeMax=time_max, maxResults=10, singleEvents=True, orderBy='startTime', q=query).execute()
-    events = events_result.get('items', [])
+    event_cache = get_event_cache()
+    if not event_cache.sync():
+        return "認証ファイルなし"
+    events = event_cache.search(query, days=7, limit=10)
     if not events:
         return "予定なし"
     result = f"予定({len(events)}件):\n"
@@ -230,17 +170,10 @@ def list_csv_tasks(status_filter: str = None) -> str:
     Returns:
         タスク一覧。タスク名、期日、完了状態を含む文字列を返す
     """
-    csv_file = "csv/tasks.csv"
-    os.makedirs("csv", exist_ok=True)
-    if not os.path.exists(csv_file):
+    repository = task_store.get_repository()
+    if not repository.exists():
         return "タスクファイルなし"
-    tasks = []
-    with open(csv_file, 'r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        for row in reader:
-            if status_filter and row.get('status', '') != status_filter:
-                continue
-            tasks.append(row)
+    tasks = [row for _, row in repository.filter(status_filter)]
     if not tasks:
         return "タスクなし"
     result = f"タスク({len(tasks)}件):\n"
@@ -270,25 +203,15 @@ def add_task_naturally(task_description: str) -> str:
         due_date = tomorrow.strftime("%Y-%m-%d")
     elif "今日" in task_description:
         due_date = datetime.datetime.now().strftime("%Y-%m-%d")
-    csv_file = "csv/tasks.csv"
-    os.makedirs("csv", exist_ok=True)
-    csv_headers = ["task_name", "due_date", "status", "created_at", "calendar_event_id"]
-    if not os.path.exists(csv_file):
-        with open(csv_file, 'w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow(csv_headers)
-    tasks = []
-    with open(csv_file, 'r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        tasks = list(reader)
+    repository = task_store.get_repository()
+    repository.initialize()
     new_task = {"task_name": task_description, "due_date": due_date, "status": "todo", "created_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "calendar_event_id": ""}
-    tasks.append(new_task)
-    with open(csv_file, 'w', newline='', encoding='utf-8') as file:
-        writer = csv.DictWriter(file, fieldnames=csv_headers)
-        writer.writeheader()
-        writer.writerows(tasks)
+    repository.add(new_task)
     return f"タスク「{task_description}」を追加"
 
+TASK_HINT_NOISE = re.compile(r"完了|やった|できた")
+TASK_MATCH_MIN_SCORE = 0.4
+
 @tool("complete_task_naturally")
 def complete_task_naturally(task_hint: str) -> str:
     """
@@ -300,33 +223,17 @@ def complete_task_naturally(task_hint: str) -> str:
     Returns:
         タスク完了の確認メッセージ、または該当タスクが見つからない場合のエラーメッセージ
     """
-    csv_file = "csv/tasks.csv"
-    os.makedirs("csv", exist_ok=True)
-    if not os.path.exists(csv_file):
+    repository = task_store.get_repository()
+    if not repository.exists():
         return "タスクファイルなし"
-    with open(csv_file, 'r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        tasks = list(reader)
-    incomplete_tasks = [(i, task) for i, task in enumerate(tasks) if task["status"] == "todo"]
-    if not incomplete_tasks:
+    if repository.count("todo") == 0:
         return "完了可能なタスクなし"
-    task_hint_clean = task_hint.lower().replace("完了", "").replace("やった", "").replace("できた", "").strip()
-    best_match = None
-    best_score = 0
-    for idx, task in incomplete_tasks:
-        task_name = task['task_name'].lower()
-        if task_hint_clean in task_name or task_name in task_hint_clean:
-            score = len(set(task_hint_clean) & set(task_name)) / len(set(task_hint_clean) | set(task_name)) if task_hint_clean and task_name else 0
-            if score > best_score and score > 0.3:
-                best_score = score
-                best_match = idx
-    if best_match is not None:
-        completed_task_name = tasks[best_match]['task_name']
-        tasks[best_match]["status"] = "done"
-        with open(csv_file, 'w', newline='', encoding='utf-8') as file:
-            writer = csv.DictWriter(file, fieldnames=["task_name", "due_date", "status", "created_at", "calendar_event_id"])
-            writer.writeheader()
-            writer.writerows(tasks)
+    task_hint_clean = TASK_HINT_NOISE.sub("", task_hint.lower()).strip()
+    candidates = repository.match(task_hint_clean, limit=1, min_score=TASK_MATCH_MIN_SCORE)
+    if candidates:
+        _, best_match, best_task = candidates[0]
+        completed_task_name = best_task['task_name']
+        repository.update(best_match, {"status": "done"})
         return f"タスク「{completed_task_name}」を完了"
     else:
         return "完了するタスクが特定できませんでした"
@@ -335,7 +242,7 @@ class IntegratedLangChainAgent:
     def __init__(self):
         api_key = os.getenv("OPENROUTER_API_KEY")
         if api_key:
-            self.llm = ChatOpenAI(model="gpt-3.5-turbo", openai_api_key=api_key, openai_api_base="https://openrouter.ai/api/v1", temperature=0.1)
+            self.llm = get_chat_llm("gpt-3.5-turbo", 0.1)
             self.llm_available = True
         else:
             self.llm = None
@@ -347,23 +254,45 @@ class IntegratedLangChainAgent:
         self.anger_stats = {"gentle": {"success": 0, "total": 0}, "direct": {"success": 0, "total": 0}}
         self._load_anger_stats()
     
-    def process_query(self, user_input: str) -> str:
+    def process_query(self, user_input: str, on_token: Optional[Callable[[str], None]] = None) -> str:
+        """
+        on_tokenを渡すと、戻り値と同じ文字列を生成されたそばから少しずつ渡す（ストリーミング表示用）
+        """
+        return run_async(self.aprocess_query(user_input, on_token))
+    
+    async def aprocess_query(self, user_input: str, on_token: Optional[Callable[[str], None]] = None) -> str:
+        """
+        怒りモードでは、ひろゆき風の回答と元の質問への回答は互いに依存しないので並行して生成する。
+        ストリーミング時は元の回答のトークンを溜めておき、ひろゆき風の回答の後に流す。
+        """
+        emit = on_token or (lambda _: None)
         if self._should_get_angry(user_input):
             incomplete_count = self._get_incomplete_task_count()
             hiroyuki_input = f"ユーザーが{incomplete_count}個ものタスクを溜め込んでいます。{user_input}"
-            hiroyuki_response = get_hiroyuki_response(hiroyuki_input)
-            original_response = self._process_original_query(user_input)
+            deferred = _DeferredEmitter(on_token) if on_token else None
+
+            async def hiroyuki_first() -> str:
+                emit("ひろゆき風: ")
+                response = await aget_hiroyuki_response(hiroyuki_input, on_token)
+                emit("\n\n元の回答:\n")
+                if deferred:
+                    deferred.release()
+                return response
+
+            hiroyuki_response, original_response = await asyncio.gather(
+                hiroyuki_first(), self._aprocess_original_query(user_input, deferred)
+            )
             speak_hiroyuki(hiroyuki_response)
             return f"ひろゆき風: {hiroyuki_response}\n\n元の回答:\n{original_response}"
         else:
-            response = self._process_original_query(user_input)
+            response = await self._aprocess_original_query(user_input, on_token)
             speak_hiroyuki(response)
             return response
     
-    def _process_original_query(self, user_input: str) -> str:
+    async def _aprocess_original_query(self, user_input: str, on_token: Optional[Callable[[str], None]] = None) -> str:
         tools_to_use = self._analyze_query(user_input)
-        tool_results = self._execute_tools(tools_to_use)
-        return self._generate_response(user_input, tool_results)
+        tool_results = await asyncio.to_thread(self._execute_tools, tools_to_use)
+        return await self._agenerate_response(user_input, tool_results, on_token)
     
     def _analyze_query(self, query: str) -> Dict[str, bool]:
         query_lower = query.lower()
@@ -385,11 +314,13 @@ class IntegratedLangChainAgent:
             results['complete_task'] = "PENDING"
         return results
     
-    def _generate_response(self, user_input: str, tool_results: Dict[str, str]) -> str:
+    async def _agenerate_response(self, user_input: str, tool_results: Dict[str, str], on_token: Optional[Callable[[str], None]] = None) -> str:
         if tool_results.get('add_task') == "PENDING":
-            return self._simple_hiroyuki_convert(add_task_naturally.func(user_input))
+            tool_output = await asyncio.to_thread(add_task_naturally.func, user_input)
+            return await self._asimple_hiroyuki_convert(tool_output, on_token)
         if tool_results.get('complete_task') == "PENDING":
-            return self._simple_hiroyuki_convert(complete_task_naturally.func(user_input))
+            tool_output = await asyncio.to_thread(complete_task_naturally.func, user_input)
+            return await self._asimple_hiroyuki_convert(tool_output, on_token)
         context = ""
         if 'calendar' in tool_results:
             context += f"📅 {tool_results['calendar']}\n\n"
@@ -397,13 +328,13 @@ class IntegratedLangChainAgent:
             context += f"📋 {tool_results['tasks']}\n\n"
         if self.llm_available:
             messages = [SystemMessage(content="タスク管理アシスタント"), HumanMessage(content=f"質問: {user_input}\n情報:\n{context}")]
-            response = self.llm.invoke(messages)
-            return self._simple_hiroyuki_convert(response.content)
+            response = await _ainvoke_llm(self.llm, messages)
+            return await self._asimple_hiroyuki_convert(response, on_token)
         else:
-            return self._simple_hiroyuki_convert(context if context else "情報取得できませんでした")
+            return await self._asimple_hiroyuki_convert(context if context else "情報取得できませんでした", on_token)
     
-    def _simple_hiroyuki_convert(self, original_response: str) -> str:
-        llm = ChatOpenAI(temperature=0.7, model="openai/gpt-3.5-turbo", openai_api_base="https://openrouter.ai/api/v1", openai_api_key=os.getenv("OPENROUTER_API_KEY"))
+    async def _asimple_hiroyuki_convert(self, original_response: str, on_token: Optional[Callable[[str], None]] = None) -> str:
+        llm = get_chat_llm("openai/gpt-3.5-turbo", 0.7)
         system_prompt = """あなたはひろゆき（西村博之）として、与えられた情報を元に回答してください。
 以下のルールを厳守してください：
 1. 主語は「おいら」を使用
@@ -414,8 +345,7 @@ class IntegratedLangChainAgent:
 6. 最後に「まぁ、頑張ってください。」や類似の締めの言葉を使う"""
         conversion_input = f"以下の情報をひろゆき風に変換して回答してください：\n{original_response}"
         messages = [SystemMessage(content=system_prompt), HumanMessage(content=conversion_input)]
-        response = llm.invoke(messages)
-        return response.content
+        return await _ainvoke_llm(llm, messages, on_token)
     
     def _should_get_angry(self, user_input: str) -> bool:
         task_check_keywords = ["タスク確認", "タスク状況", "未完了", "残り", "進捗", "タスク一覧", "やること確認"]
@@ -426,13 +356,10 @@ class IntegratedLangChainAgent:
         return incomplete_count >= 5
     
     def _get_incomplete_task_count(self) -> int:
-        csv_file = "csv/tasks.csv"
-        if not os.path.exists(csv_file):
+        repository = task_store.get_repository()
+        if not repository.exists():
             return 0
-        with open(csv_file, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            count = sum(1 for row in reader if row.get('status') == 'todo')
-            return count
+        return repository.count('todo')
     
     def _load_anger_stats(self) -> None:
         if os.path.exists(self.anger_stats_file):
@@ -443,6 +370,9 @@ class IntegratedLangChainAgent:
         return "効果レポート"
 
 def integrated_langchain_mode() -> None:
+    if _tts_available:
+        # 最初の回答までにモデルを読み込んでおく
+        _get_tts_worker()
     agent = IntegratedLangChainAgent()
     while True:
         user_input = input("質問: ").strip()
@@ -453,5 +383,10 @@ def integrated_langchain_mode() -> None:
         if user_input.lower() in ['怒り分析', '効果レポート']:
             print(f"\n{agent.get_simple_anger_report()}\n")
             continue
-        response = agent.process_query(user_input)
-        print(f"\n{response}\n")
\ No newline at end of file
+        if STREAM_OUTPUT:
+            print()
+            agent.process_query(user_input, on_token=lambda token: print(token, end="", flush=True))
+            print("\n")
+        else:
+            response = agent.process_query(user_input)
+            print(f"\n{response}\n")
\ No newline at end of file
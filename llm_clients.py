@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import asyncio
+import threading
+from typing import Any, Coroutine, Dict, Tuple
+
+import httpx
+from langchain_openai import ChatOpenAI
+from dotenv import load_dotenv
+
+load_dotenv()
+
+OPENROUTER_API_BASE = os.getenv("OPENROUTER_API_BASE", "https://openrouter.ai/api/v1")
+
+_lock = threading.Lock()
+_clients: Dict[Tuple[str, float], ChatOpenAI] = {}
+_http_client = None
+_async_http_client = None
+_loop = None
+
+
+def _shared_http_client() -> httpx.Client:
+    """OpenRouterへのKeep-Alive接続を使い回すためのHTTPクライアント（全モデル共通）"""
+    global _http_client
+    if _http_client is None:
+        _http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=120),
+            timeout=httpx.Timeout(60.0, connect=10.0),
+        )
+    return _http_client
+
+
+def _event_loop() -> asyncio.AbstractEventLoop:
+    """非同期LLM呼び出し専用のイベントループ（バックグラウンドスレッドで常駐）"""
+    global _loop
+    with _lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="llm-event-loop", daemon=True).start()
+        return _loop
+
+
+def run_async(coro: Coroutine[Any, Any, Any]) -> Any:
+    """
+    コルーチンを常駐ループで実行して結果を待つ
+
+    asyncio.runで毎回ループを作り直すと、共有している非同期HTTPクライアントの
+    接続が閉じたループに紐づいて使えなくなるため、ループは1つを使い続ける。
+    """
+    return asyncio.run_coroutine_threadsafe(coro, _event_loop()).result()
+
+
+def _shared_async_http_client() -> httpx.AsyncClient:
+    global _async_http_client
+    if _async_http_client is None:
+        _async_http_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=120),
+            timeout=httpx.Timeout(60.0, connect=10.0),
+        )
+    return _async_http_client
+
+
+def get_chat_llm(model: str = "openai/gpt-3.5-turbo", temperature: float = 0.7) -> ChatOpenAI:
+    """
+    モデルとtemperatureごとに1つだけChatOpenAIを作って使い回す
+
+    呼び出しのたびにクライアントを作り直すと、初期化コストに加えて
+    TCP/TLS接続も毎回張り直しになるため、ホットパスではこちらを使う。
+    """
+    key = (model, temperature)
+    with _lock:
+        llm = _clients.get(key)
+        if llm is None:
+            llm = ChatOpenAI(
+                model=model,
+                temperature=temperature,
+                openai_api_base=OPENROUTER_API_BASE,
+                openai_api_key=os.getenv("OPENROUTER_API_KEY"),
+                http_client=_shared_http_client(),
+                http_async_client=_shared_async_http_client(),
+            )
+            _clients[key] = llm
+        return llm
+
+
+def clear_llm_clients() -> None:
+    """登録済みクライアントと共有接続を破棄する（APIキー変更時など）"""
+    global _http_client, _async_http_client
+    with _lock:
+        _clients.clear()
+        if _http_client is not None:
+            _http_client.close()
+            _http_client = None
+        async_client, _async_http_client = _async_http_client, None
+    if async_client is not None and _loop is not None:
+        run_async(async_client.aclose())
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+会話ログ（CSV）のローテーションと列指向アーカイブ
+
+ログが LOG_ROTATE_MAX_MB を超えるか、先頭行の日付が LOG_ROTATE_PERIOD
+（day / month / none）の区切りをまたいだら、ログを archive/ 以下に退避して
+列指向のgzipセグメントに変換する。セグメントの中身は
+1行目がメタ情報（列名・行数）、以降が1列1行のJSON配列。
+同じ列の値が並ぶので圧縮が効き、特定の列だけを読む集計では他の列をパースしない。
+セグメント数・合計サイズが上限を超えたら古いものから消す。
+
+使い方:
+    python log_archive.py rotate csv/simple_conversations.csv
+    python log_archive.py add csv/simple_conversations_backup.csv --log csv/simple_conversations.csv
+    python log_archive.py count csv/simple_conversations.csv
+"""
+
+import os
+import csv
+import sys
+import gzip
+import json
+import argparse
+import datetime
+import threading
+from typing import Dict, Iterator, List, Optional, Sequence
+
+LOG_ROTATE_MAX_BYTES = int(float(os.getenv("LOG_ROTATE_MAX_MB", "5")) * 1024 * 1024)
+LOG_ROTATE_PERIOD = os.getenv("LOG_ROTATE_PERIOD", "month")
+LOG_ARCHIVE_MAX_SEGMENTS = int(os.getenv("LOG_ARCHIVE_MAX_SEGMENTS", "36"))
+LOG_ARCHIVE_MAX_BYTES = int(float(os.getenv("LOG_ARCHIVE_MAX_MB", "100")) * 1024 * 1024)
+SEGMENT_SUFFIX = ".cols.gz"
+
+_PERIOD_LENGTH = {"day": 10, "month": 7}
+
+_lock = threading.Lock()
+# ログファイル → 先頭行の期間キー（毎回ファイルを開かないためのキャッシュ）
+_first_period: Dict[str, Optional[str]] = {}
+
+
+def archive_dir(log_path: str) -> str:
+    return os.path.join(os.path.dirname(log_path) or ".", "archive")
+
+
+def _stem(log_path: str) -> str:
+    return os.path.splitext(os.path.basename(log_path))[0]
+
+
+def list_segments(log_path: str) -> List[str]:
+    """log_pathのセグメントを古い順に返す"""
+    directory = archive_dir(log_path)
+    prefix = f"{_stem(log_path)}-"
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return []
+    return [os.path.join(directory, name) for name in sorted(names)
+            if name.startswith(prefix) and name.endswith(SEGMENT_SUFFIX)]
+
+
+def _period_key(timestamp: str) -> Optional[str]:
+    length = _PERIOD_LENGTH.get(LOG_ROTATE_PERIOD)
+    if not length or len(timestamp) < length:
+        return None
+    return timestamp[:length]
+
+
+def _read_first_timestamp(log_path: str) -> str:
+    try:
+        with open(log_path, 'r', newline='', encoding='utf-8') as file:
+            reader = csv.reader(file)
+            next(reader, None)
+            row = next(reader, None)
+    except FileNotFoundError:
+        return ""
+    return row[0] if row else ""
+
+
+def should_rotate(log_path: str) -> bool:
+    try:
+        size = os.path.getsize(log_path)
+    except FileNotFoundError:
+        return False
+    if size >= LOG_ROTATE_MAX_BYTES:
+        return True
+    if LOG_ROTATE_PERIOD not in _PERIOD_LENGTH:
+        return False
+    first_period = _first_period.get(log_path)
+    if first_period is None:
+        # ヘッダーだけのログでは期間が決まらないので、データ行ができるまで毎回読み直す
+        first_period = _period_key(_read_first_timestamp(log_path))
+        if first_period is not None:
+            _first_period[log_path] = first_period
+    now_period = _period_key(datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    return first_period is not None and first_period != now_period
+
+
+def write_segment(rows: Sequence[Sequence[str]], columns: Sequence[str], segment_path: str) -> None:
+    """行の並びを列ごとのJSON配列にしてgzipで書く"""
+    tmp_path = f"{segment_path}.tmp"
+    with gzip.open(tmp_path, 'wt', encoding='utf-8') as file:
+        file.write(json.dumps({"columns": list(columns), "rows": len(rows)}, ensure_ascii=False) + "\n")
+        for i in range(len(columns)):
+            file.write(json.dumps([row[i] if i < len(row) else "" for row in rows], ensure_ascii=False) + "\n")
+    os.replace(tmp_path, segment_path)
+
+
+def _segment_path(log_path: str, first_timestamp: str) -> str:
+    digits = "".join(ch for ch in first_timestamp if ch.isdigit())[:14]
+    label = digits or datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+    base = os.path.join(archive_dir(log_path), f"{_stem(log_path)}-{label}")
+    path = f"{base}{SEGMENT_SUFFIX}"
+    counter = 1
+    while os.path.exists(path):
+        path = f"{base}_{counter:03d}{SEGMENT_SUFFIX}"
+        counter += 1
+    return path
+
+
+def archive_csv(csv_path: str, log_path: str) -> Optional[str]:
+    """CSVファイルの中身をlog_pathのセグメントとして保存し、そのパスを返す（CSV自体は残す）"""
+    with open(csv_path, 'r', newline='', encoding='utf-8') as file:
+        reader = csv.reader(file)
+        columns = next(reader, None)
+        rows = list(reader)
+    if not columns or not rows:
+        return None
+    os.makedirs(archive_dir(log_path), exist_ok=True)
+    segment_path = _segment_path(log_path, rows[0][0] if rows[0] else "")
+    write_segment(rows, columns, segment_path)
+    enforce_retention(log_path)
+    return segment_path
+
+
+def rotate(log_path: str) -> Optional[str]:
+    """
+    ログを退避してセグメントに変換する
+
+    先に別名へrenameしてから変換するので、変換中に書かれた行は新しいログに入る。
+    """
+    with _lock:
+        if not os.path.exists(log_path):
+            return None
+        os.makedirs(archive_dir(log_path), exist_ok=True)
+        rotated_path = os.path.join(archive_dir(log_path),
+                                    f"{_stem(log_path)}.rotating-{datetime.datetime.now().strftime('%Y%m%d%H%M%S%f')}.csv")
+        os.replace(log_path, rotated_path)
+        _first_period.pop(log_path, None)
+    try:
+        segment_path = archive_csv(rotated_path, log_path)
+    except (OSError, csv.Error) as e:
+        print(f"ログのアーカイブに失敗しました ({rotated_path}): {e}")
+        return None
+    os.remove(rotated_path)
+    return segment_path
+
+
+def maybe_rotate(log_path: str) -> None:
+    """しきい値を超えていればローテーションする（log_writerが書き込みの前に呼ぶ）"""
+    if should_rotate(log_path):
+        rotate(log_path)
+
+
+def enforce_retention(log_path: str) -> None:
+    """セグメント数と合計サイズの上限を超えた分を古い順に消す"""
+    segments = list_segments(log_path)
+    sizes = {path: os.path.getsize(path) for path in segments}
+    total = sum(sizes.values())
+    while segments and (len(segments) > LOG_ARCHIVE_MAX_SEGMENTS or total > LOG_ARCHIVE_MAX_BYTES):
+        oldest = segments.pop(0)
+        total -= sizes[oldest]
+        os.remove(oldest)
+
+
+def read_segment_columns(segment_path: str, columns: Optional[Sequence[str]] = None) -> Dict[str, List[str]]:
+    """セグメントから指定した列だけを読み込む（他の列の行はJSONとしてパースしない）"""
+    with gzip.open(segment_path, 'rt', encoding='utf-8') as file:
+        meta = json.loads(file.readline())
+        wanted = set(columns) if columns is not None else None
+        result = {}
+        for name in meta["columns"]:
+            line = file.readline()
+            if wanted is None or name in wanted:
+                result[name] = json.loads(line)
+    rows = meta["rows"]
+    for name in columns or []:
+        result.setdefault(name, [""] * rows)
+    return result
+
+
+def iter_log(log_path: str, columns: Optional[Sequence[str]] = None) -> Iterator[Dict[str, str]]:
+    """
+    アーカイブ済みセグメント（古い順）と現在のログを続けて1行ずつ返す
+
+    columnsを指定するとその列だけを返す。列がないセグメントでは空文字になる。
+    """
+    for segment_path in list_segments(log_path):
+        data = read_segment_columns(segment_path, columns)
+        names = list(columns) if columns is not None else list(data)
+        values = [data[name] for name in names]
+        for row in zip(*values):
+            yield dict(zip(names, row))
+    try:
+        with open(log_path, 'r', newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                if columns is None:
+                    yield {key: value or "" for key, value in row.items()}
+                else:
+                    yield {name: row.get(name) or "" for name in columns}
+    except FileNotFoundError:
+        return
+
+
+def count_rows(log_path: str) -> int:
+    """セグメントはメタ情報の行数だけを読んで数える"""
+    total = 0
+    for segment_path in list_segments(log_path):
+        with gzip.open(segment_path, 'rt', encoding='utf-8') as file:
+            total += json.loads(file.readline())["rows"]
+    try:
+        with open(log_path, 'r', newline='', encoding='utf-8') as file:
+            total += max(sum(1 for _ in csv.reader(file)) - 1, 0)
+    except FileNotFoundError:
+        pass
+    return total
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["rotate", "add", "count"])
+    parser.add_argument("path")
+    parser.add_argument("--log", help="addで取り込み先にするログファイル")
+    args = parser.parse_args()
+
+    if args.command == "rotate":
+        segment_path = rotate(args.path)
+        print(f"アーカイブしました: {segment_path}" if segment_path else "アーカイブするログがありません")
+    elif args.command == "add":
+        if not args.log:
+            print("--log を指定してください")
+            sys.exit(1)
+        segment_path = archive_csv(args.path, args.log)
+        print(f"アーカイブしました: {segment_path}" if segment_path else "取り込む行がありません")
+    else:
+        count = count_rows(args.path)
+        print(f"{len(list_segments(args.path))}セグメント + 現在のログ: 合計{count}行")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import io
+import os
+import csv
+import time
+import atexit
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from log_archive import maybe_rotate
+
+# バッファの行数がこれを超えるか、最後の書き込みからこの秒数が経ったらまとめて書き出す
+LOG_FLUSH_MAX_RECORDS = int(os.getenv("LOG_FLUSH_MAX_RECORDS", "100"))
+LOG_FLUSH_INTERVAL = float(os.getenv("LOG_FLUSH_INTERVAL", "2.0"))
+
+
+class LogWriter:
+    """
+    会話ログ（CSV）のバッファ付き書き込み
+
+    write_row()はメモリのバッファに積むだけですぐに戻り、
+    バックグラウンドスレッドがファイルごとにまとめて追記する。
+    追記の前にlog_archiveのしきい値を確認し、超えていればローテーションする。
+    行数・経過時間のしきい値に加え、プロセス終了時（atexit）にも書き出す。
+    """
+
+    def __init__(self, max_records: int = LOG_FLUSH_MAX_RECORDS, interval: float = LOG_FLUSH_INTERVAL):
+        self.max_records = max_records
+        self.interval = interval
+        self._pending: List[Tuple[str, Sequence, Optional[Sequence]]] = []
+        self._condition = threading.Condition()
+        # ファイル書き込みとflush()の呼び出しを直列化する
+        self._write_lock = threading.Lock()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def write_row(self, path: str, row: Sequence, header: Optional[Sequence] = None) -> None:
+        """pathに1行追記する。ファイルがまだなければheaderを先に書く"""
+        with self._condition:
+            self._pending.append((path, row, header))
+            if len(self._pending) >= self.max_records:
+                self._condition.notify()
+
+    def _take_pending(self) -> List[Tuple[str, Sequence, Optional[Sequence]]]:
+        with self._condition:
+            pending, self._pending = self._pending, []
+            return pending
+
+    def _write(self, pending: List[Tuple[str, Sequence, Optional[Sequence]]]) -> None:
+        by_path: Dict[str, Tuple[Optional[Sequence], List[Sequence]]] = {}
+        for path, row, header in pending:
+            by_path.setdefault(path, (header, []))[1].append(row)
+        for path, (header, rows) in by_path.items():
+            try:
+                maybe_rotate(path)
+            except OSError as e:
+                print(f"ログのローテーションに失敗しました ({path}): {e}")
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            if header and (not os.path.exists(path) or os.path.getsize(path) == 0):
+                writer.writerow(header)
+            writer.writerows(rows)
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                with open(path, 'a', newline='', encoding='utf-8') as file:
+                    file.write(buffer.getvalue())
+            except OSError as e:
+                print(f"ログ書き込みエラー ({path}): {e}")
+
+    def flush(self) -> None:
+        """バッファの内容を今すぐ書き出す（ログファイルを読む前などに呼ぶ）"""
+        with self._write_lock:
+            self._write(self._take_pending())
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                deadline = time.monotonic() + self.interval
+                while not self._closed and len(self._pending) < self.max_records:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                closed = self._closed
+            self.flush()
+            if closed:
+                return
+
+    def close(self) -> None:
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+
+_log_writer: Optional[LogWriter] = None
+_log_writer_lock = threading.Lock()
+
+
+def get_log_writer() -> LogWriter:
+    """会話ログ用に共有するライター（終了時に残りを書き出す）"""
+    global _log_writer
+    with _log_writer_lock:
+        if _log_writer is None:
+            _log_writer = LogWriter()
+            atexit.register(_log_writer.close)
+        return _log_writer
+
+
+def flush_if_started() -> None:
+    """ライターが動いていればバッファを書き出す（ログを読む側が呼ぶ。未使用ならライターを作らない）"""
+    with _log_writer_lock:
+        writer = _log_writer
+    if writer is not None:
+        writer.flush()
@@ -1,7 +1,6 @@
 #!/usr/bin/env python3
 import sys
 import os
-import csv
 import datetime
 from typing import List, Dict
 
@@ -12,46 +11,20 @@ if '' in sys.path:
 system_lib_path = '/usr/local/lib/python3.12/dist-packages'
 if system_lib_path not in sys.path:
     sys.path.insert(0, system_lib_path)
-try:
-    from integrated_langchain import integrated_langchain_mode as natural_language_mode_langchain
-    LANGCHAIN_NLP_AVAILABLE = True
-except ImportError:
-    LANGCHAIN_NLP_AVAILABLE = False
-    def natural_language_mode_langchain():
-        print("LangChain依存関係が不足しています")
-
-try:
-    from rag_mode import rag_mode
-except ImportError:
-    def rag_mode():
-        print("依存関係が不足しています")
-
-CSV_FILE = "csv/tasks.csv"
-CSV_HEADERS = ["task_name", "due_date", "status", "created_at", "calendar_event_id"]
+app_dir = os.path.dirname(os.path.abspath(__file__))
+if app_dir not in sys.path:
+    sys.path.insert(0, app_dir)
+import task_store
+from task_store import CSV_FILE, CSV_HEADERS
 
 def initialize_csv() -> None:
-    os.makedirs("csv", exist_ok=True)
-    if not os.path.exists(CSV_FILE):
-        with open(CSV_FILE, 'w', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            writer.writerow(CSV_HEADERS)
+    task_store.initialize_store()
 
 def read_tasks() -> List[Dict[str, str]]:
-    tasks = []
-    try:
-        with open(CSV_FILE, 'r', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            for row in reader:
-                tasks.append(row)
-    except FileNotFoundError:
-        pass
-    return tasks
+    return task_store.read_tasks()
 
 def write_tasks(tasks: List[Dict[str, str]]) -> None:
-    with open(CSV_FILE, 'w', newline='', encoding='utf-8') as file:
-        writer = csv.DictWriter(file, fieldnames=CSV_HEADERS)
-        writer.writeheader()
-        writer.writerows(tasks)
+    task_store.write_tasks(tasks)
 
 def add_task() -> None:
     print("\n=== タスク追加 ===")
@@ -71,9 +44,7 @@ def add_task() -> None:
         "created_at": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         "calendar_event_id": ""
     }
-    tasks = read_tasks()
-    tasks.append(new_task)
-    write_tasks(tasks)
+    task_store.add_task_record(new_task)
 
 def show_tasks() -> None:
     tasks = read_tasks()
@@ -83,36 +54,57 @@ def show_tasks() -> None:
         due_info = f" ({task['due_date']})" if task['due_date'] else ""
         status_jp = "完了" if task["status"] == "done" else "未完了"
         print(f"[{i}] {task['task_name']}{due_info} - {status_jp}")
+    today = datetime.datetime.now().strftime("%Y-%m-%d")
+    upcoming = task_store.get_repository().next_due(3, from_date=today)
+    if upcoming:
+        print("\n次の期限:")
+        for _, task in upcoming:
+            print(f"- {task['due_date']} {task['task_name']}")
 
 def complete_task() -> None:
-    tasks = read_tasks()
-    if not tasks:
-        return
-    incomplete_tasks = [task for task in tasks if task["status"] == "todo"]
+    incomplete_tasks = task_store.get_repository().filter("todo")
     if not incomplete_tasks:
         return
-    task_indices = []
-    display_count = 1
-    for i, task in enumerate(tasks):
-        if task["status"] == "todo":
-            due_info = f" ({task['due_date']})" if task['due_date'] else ""
-            print(f"[{display_count}] {task['task_name']}{due_info}")
-            task_indices.append(i)
-            display_count += 1
+    for display_count, (_, task) in enumerate(incomplete_tasks, 1):
+        due_info = f" ({task['due_date']})" if task['due_date'] else ""
+        print(f"[{display_count}] {task['task_name']}{due_info}")
     try:
         choice = int(input("番号: "))
-        if 1 <= choice <= len(task_indices):
-            actual_index = task_indices[choice - 1]
-            tasks[actual_index]["status"] = "done"
-            write_tasks(tasks)
+        if 1 <= choice <= len(incomplete_tasks):
+            actual_index = incomplete_tasks[choice - 1][0]
+            task_store.update_task_record(actual_index, {"status": "done"})
     except ValueError:
         pass
 
+# 自然言語モード・RAGモードはLangChainやllama-indexなど重い依存を読み込むので、
+# 起動時ではなくメニューで最初に選ばれたときにimportする
 def natural_language_mode() -> None:
-    if LANGCHAIN_NLP_AVAILABLE:
-        natural_language_mode_langchain()
-    else:
-        print("LangChain利用不可")
+    try:
+        from integrated_langchain import integrated_langchain_mode
+    except ImportError as e:
+        print(f"LangChain利用不可: {e}")
+        return
+    integrated_langchain_mode()
+
+def rag_mode() -> None:
+    try:
+        from rag_mode import rag_mode as run_rag_mode
+    except ImportError as e:
+        print(f"依存関係が不足しています: {e}")
+        return
+    run_rag_mode()
+
+def calendar_sync() -> None:
+    try:
+        from calendar_sync import format_sync_stats, sync_tasks_with_calendar
+    except ImportError as e:
+        print(f"依存関係が不足しています: {e}")
+        return
+    stats = sync_tasks_with_calendar()
+    if stats is None:
+        print("認証ファイルなし")
+        return
+    print(format_sync_stats(stats))
 
 # メニュー画面
 def show_menu() -> None:
@@ -122,6 +114,7 @@ def show_menu() -> None:
     print("4. AI自然言語")
     print("5. RAGモード")
     print("6. 終了")
+    print("7. カレンダー同期")
 
 # メニュー画面の選択に応じた挙動
 def main() -> None:
@@ -140,7 +133,10 @@ def main() -> None:
         elif choice == "5":
             rag_mode()
         elif choice == "6":
+            task_store.compact_store()
             break
+        elif choice == "7":
+            calendar_sync()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import math
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from typing import Callable, List, Optional, Tuple
+
+from task_matcher import normalize_text
+
+RAG_ANSWER_CACHE_DB = os.getenv("RAG_ANSWER_CACHE_DB", "cache/rag_answers.db")
+RAG_ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("RAG_ANSWER_CACHE_MAX_ENTRIES", "2000"))
+# 1なら言い回しの違う質問も埋め込みのコサイン類似度で同じ質問とみなす
+RAG_ANSWER_CACHE_SEMANTIC = os.getenv("RAG_ANSWER_CACHE_SEMANTIC", "0") == "1"
+RAG_ANSWER_CACHE_SIMILARITY = float(os.getenv("RAG_ANSWER_CACHE_SIMILARITY", "0.95"))
+
+
+def normalize_question(question: str) -> str:
+    """全角・半角、大文字・小文字、空白・句読点（「？」など）の違いを無視する"""
+    return normalize_text(question)
+
+
+def document_key(content_hash: str, *settings: str) -> str:
+    """ドキュメントの内容ハッシュと、回答に影響する設定（チャンク・モデル・プロンプト）からキーを作る"""
+    raw = json.dumps([content_hash, *settings], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class RagAnswerCache:
+    """
+    RAGの回答キャッシュ（SQLite）
+
+    キーはドキュメントキーと正規化した質問。semanticを有効にすると、
+    完全一致がなかったときに同じドキュメントの過去の質問の埋め込みと比べ、
+    類似度がしきい値以上なら同じ質問として回答を返す。
+    件数が上限を超えたら最後に使われた時刻が古いものから消す。
+    """
+
+    def __init__(self, db_file: str = RAG_ANSWER_CACHE_DB, max_entries: int = RAG_ANSWER_CACHE_MAX_ENTRIES,
+                 semantic: bool = RAG_ANSWER_CACHE_SEMANTIC, similarity: float = RAG_ANSWER_CACHE_SIMILARITY):
+        self.db_file = db_file
+        self.max_entries = max_entries
+        self.semantic = semantic
+        self.similarity = similarity
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_file) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS answers (doc_key TEXT NOT NULL, question_key TEXT NOT NULL, "
+                "question TEXT NOT NULL, answer TEXT NOT NULL, source_documents TEXT NOT NULL, "
+                "embedding BLOB, accessed_at REAL NOT NULL, PRIMARY KEY (doc_key, question_key))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_accessed_at ON answers (accessed_at)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, doc_key: str, question: str,
+            embed: Optional[Callable[[str], List[float]]] = None) -> Optional[Tuple[str, str]]:
+        """
+        (回答, 出典)を返す。なければNone
+
+        embedは質問を埋め込みベクトルにする関数（semantic有効時のみ使う）。
+        """
+        return self.lookup(doc_key, question, embed)[0]
+
+    def lookup(self, doc_key: str, question: str, embed: Optional[Callable[[str], List[float]]] = None
+               ) -> Tuple[Optional[Tuple[str, str]], Optional[List[float]]]:
+        """
+        get()と同じだが、途中で計算した質問の埋め込みも返す（計算しなければNone）
+
+        キャッシュになかったときはこの埋め込みをput()に渡すと、同じ質問を2度埋め込まずに済む。
+        """
+        question_key = normalize_question(question)
+        query_embedding = None
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                "SELECT answer, source_documents FROM answers WHERE doc_key = ? AND question_key = ?",
+                (doc_key, question_key)
+            ).fetchone()
+            if row is None and self.semantic and embed is not None:
+                query_embedding = embed(question)
+                row, question_key = self._nearest(conn, doc_key, query_embedding)
+            if row is None:
+                self.misses += 1
+                return None, query_embedding
+            with conn:
+                conn.execute("UPDATE answers SET accessed_at = ? WHERE doc_key = ? AND question_key = ?",
+                             (time.time(), doc_key, question_key))
+            self.hits += 1
+            return (row[0], row[1]), query_embedding
+
+    def _nearest(self, conn: sqlite3.Connection, doc_key: str, query_embedding: List[float]):
+        best_row, best_key, best_score = None, None, self.similarity
+        rows = conn.execute(
+            "SELECT question_key, answer, source_documents, embedding FROM answers "
+            "WHERE doc_key = ? AND embedding IS NOT NULL", (doc_key,)
+        )
+        for question_key, answer, source_documents, blob in rows:
+            score = _cosine(query_embedding, array('f', blob))
+            if score >= best_score:
+                best_row, best_key, best_score = (answer, source_documents), question_key, score
+        return best_row, best_key
+
+    def put(self, doc_key: str, question: str, answer: str, source_documents: str = "",
+            embed: Optional[Callable[[str], List[float]]] = None, embedding: Optional[List[float]] = None) -> None:
+        """embeddingにlookup()が返した埋め込みを渡せば、embedは呼ばない"""
+        if not answer.strip():
+            return
+        if self.semantic and embedding is None and embed is not None:
+            embedding = embed(question)
+        blob = array('f', embedding).tobytes() if self.semantic and embedding is not None else None
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO answers (doc_key, question_key, question, answer, source_documents, "
+                    "embedding, accessed_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (doc_key, normalize_question(question), question, answer, source_documents, blob, time.time())
+                )
+                conn.execute(
+                    "DELETE FROM answers WHERE rowid IN (SELECT rowid FROM answers ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,)
+                )
+
+    def clear(self) -> None:
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM answers")
+
+
+_rag_answer_cache: Optional[RagAnswerCache] = None
+
+
+def get_rag_answer_cache() -> RagAnswerCache:
+    global _rag_answer_cache
+    if _rag_answer_cache is None:
+        _rag_answer_cache = RagAnswerCache()
+    return _rag_answer_cache
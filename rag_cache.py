@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import shutil
+import hashlib
+import time
+from typing import Optional
+
+try:
+    from llama_index.core import StorageContext, load_index_from_storage
+    RAG_CACHE_AVAILABLE = True
+except ImportError:
+    RAG_CACHE_AVAILABLE = False
+
+RAG_CACHE_DIR = os.getenv("RAG_CACHE_DIR", "rag_cache")
+RAG_INDEX_CACHE_MAX_BYTES = int(os.getenv("RAG_INDEX_CACHE_MAX_MB", "500")) * 1024 * 1024
+CHUNK_SIZE = 512
+CHUNK_OVERLAP = 50
+
+_INDEX_DIR = "indexes"
+_META_FILE = "cache_meta.json"
+
+
+def file_content_hash(path: str) -> str:
+    """ファイル内容のSHA-256（大きなPDFでもメモリに載せずに計算）"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def index_cache_key(content_hash: str, chunk_size: int = CHUNK_SIZE, chunk_overlap: int = CHUNK_OVERLAP,
+                    embed_model_name: str = "") -> str:
+    """PDFの内容ハッシュとチャンク設定・埋め込みモデルからキャッシュキーを作る"""
+    raw = json.dumps({
+        "content": content_hash,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "embed_model": embed_model_name,
+    }, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+
+def _index_root() -> str:
+    return os.path.join(RAG_CACHE_DIR, _INDEX_DIR)
+
+
+def _entry_dir(key: str) -> str:
+    return os.path.join(_index_root(), key)
+
+
+def _dir_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def load_cached_index(key: str):
+    """キャッシュ済みインデックスを読み込む。なければNone"""
+    if not RAG_CACHE_AVAILABLE:
+        return None
+    entry = _entry_dir(key)
+    if not os.path.exists(os.path.join(entry, _META_FILE)):
+        return None
+    try:
+        storage_context = StorageContext.from_defaults(persist_dir=entry)
+        index = load_index_from_storage(storage_context)
+    except Exception as e:
+        print(f"⚠️ インデックスキャッシュの読み込みに失敗しました: {e}")
+        shutil.rmtree(entry, ignore_errors=True)
+        return None
+    # 最終利用時刻を更新（LRU削除の判定に使う）
+    os.utime(os.path.join(entry, _META_FILE))
+    return index
+
+
+def save_cached_index(index, key: str, source: str = "") -> None:
+    """インデックスを一時ディレクトリに保存してから差し替え、容量超過分を削除する"""
+    if not RAG_CACHE_AVAILABLE:
+        return
+    os.makedirs(_index_root(), exist_ok=True)
+    entry = _entry_dir(key)
+    tmp_entry = f"{entry}.tmp{os.getpid()}"
+    try:
+        index.storage_context.persist(persist_dir=tmp_entry)
+        with open(os.path.join(tmp_entry, _META_FILE), 'w', encoding='utf-8') as file:
+            json.dump({"source": source, "created_at": time.time()}, file, ensure_ascii=False)
+        shutil.rmtree(entry, ignore_errors=True)
+        os.replace(tmp_entry, entry)
+    except Exception as e:
+        print(f"⚠️ インデックスキャッシュの保存に失敗しました: {e}")
+        shutil.rmtree(tmp_entry, ignore_errors=True)
+        return
+    evict_index_cache(keep=key)
+
+
+def evict_index_cache(max_bytes: int = RAG_INDEX_CACHE_MAX_BYTES, keep: Optional[str] = None) -> None:
+    """合計サイズがmax_bytesを超えたら、最後に使われた時刻が古いものから削除する"""
+    root = _index_root()
+    if not os.path.isdir(root):
+        return
+    entries = []
+    for key in os.listdir(root):
+        meta = os.path.join(root, key, _META_FILE)
+        if not os.path.exists(meta):
+            continue
+        entries.append((os.path.getmtime(meta), key, _dir_size(os.path.join(root, key))))
+    total = sum(size for _, _, size in entries)
+    for _, key, size in sorted(entries):
+        if total <= max_bytes:
+            break
+        if key == keep:
+            continue
+        shutil.rmtree(os.path.join(root, key), ignore_errors=True)
+        total -= size
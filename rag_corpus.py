@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Tuple
+
+try:
+    from llama_index.core import SimpleDirectoryReader, VectorStoreIndex, StorageContext, load_index_from_storage
+    RAG_CORPUS_AVAILABLE = True
+except ImportError:
+    RAG_CORPUS_AVAILABLE = False
+
+from rag_cache import RAG_CACHE_DIR, CHUNK_SIZE, CHUNK_OVERLAP, file_content_hash
+
+RAG_PARSE_WORKERS = int(os.getenv("RAG_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_MANIFEST_FILE = "manifest.json"
+
+
+def _parse_pdf(path: str) -> List:
+    """ワーカープロセスで1つのPDFを読み込む"""
+    return SimpleDirectoryReader(input_files=[path]).load_data()
+
+
+def corpus_cache_dir(directory: str) -> str:
+    key = hashlib.sha256(os.path.abspath(directory).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(RAG_CACHE_DIR, "corpora", key)
+
+
+def scan_pdfs(directory: str) -> Dict[str, Dict[str, float]]:
+    """ディレクトリ以下のPDFを{相対パス: {mtime, size}}で返す"""
+    found = {}
+    for root, _, files in os.walk(directory):
+        for name in files:
+            if not name.lower().endswith('.pdf'):
+                continue
+            path = os.path.join(root, name)
+            stat = os.stat(path)
+            rel_path = os.path.relpath(path, directory)
+            found[rel_path] = {"mtime": stat.st_mtime, "size": stat.st_size}
+    return found
+
+
+def _parse_in_pool(paths: List[str]) -> List[Tuple[str, List]]:
+    """PDFをプロセスプールで並列に読み込む。失敗したファイルは結果に含めない"""
+    results = []
+    if len(paths) <= 1 or RAG_PARSE_WORKERS <= 1:
+        for path in paths:
+            try:
+                results.append((path, _parse_pdf(path)))
+            except Exception as e:
+                print(f"⚠️ {os.path.basename(path)} の読み込みに失敗しました: {e}")
+        return results
+    with ProcessPoolExecutor(max_workers=RAG_PARSE_WORKERS) as executor:
+        futures = [(path, executor.submit(_parse_pdf, path)) for path in paths]
+        for path, future in futures:
+            try:
+                results.append((path, future.result()))
+            except Exception as e:
+                print(f"⚠️ {os.path.basename(path)} の読み込みに失敗しました: {e}")
+    return results
+
+
+def _load_manifest(persist_dir: str) -> Dict:
+    try:
+        with open(os.path.join(persist_dir, _MANIFEST_FILE), 'r', encoding='utf-8') as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _save_manifest(persist_dir: str, manifest: Dict) -> None:
+    path = os.path.join(persist_dir, _MANIFEST_FILE)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as file:
+        json.dump(manifest, file, ensure_ascii=False)
+    os.replace(f"{path}.tmp", path)
+
+
+def load_or_update_corpus_index(directory: str, embed_model_name: str = ""):
+    """
+    ディレクトリ内のPDF群からインデックスを作成・更新する
+
+    前回実行時のマニフェスト（ファイルごとのmtime・サイズ・内容ハッシュ・ドキュメントID）と
+    比較し、追加・変更されたPDFだけをプロセスプールで読み込んで挿入し、
+    削除・変更されたPDFのドキュメントはインデックスから取り除く。
+
+    Returns:
+        (インデックス, {"added": 件数, "updated": 件数, "removed": 件数})
+    """
+    persist_dir = corpus_cache_dir(directory)
+    settings = {"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP, "embed_model": embed_model_name}
+    manifest = _load_manifest(persist_dir)
+    index = None
+    if manifest.get("settings") == settings:
+        try:
+            index = load_index_from_storage(StorageContext.from_defaults(persist_dir=persist_dir))
+        except Exception as e:
+            print(f"⚠️ コーパスインデックスの読み込みに失敗したため作り直します: {e}")
+    if index is None:
+        manifest = {"settings": settings, "files": {}}
+    files = manifest["files"]
+
+    current = scan_pdfs(directory)
+    removed = [rel_path for rel_path in files if rel_path not in current]
+    changed = []
+    dirty = bool(removed)
+    for rel_path, stat in current.items():
+        entry = files.get(rel_path)
+        if entry and entry["mtime"] == stat["mtime"] and entry["size"] == stat["size"]:
+            continue
+        content_hash = file_content_hash(os.path.join(directory, rel_path))
+        if entry and entry["hash"] == content_hash:
+            # 内容が同じならタイムスタンプだけ更新
+            entry.update(stat)
+            dirty = True
+            continue
+        changed.append((rel_path, content_hash, stat))
+
+    stale = removed + [rel_path for rel_path, _, _ in changed if rel_path in files]
+    if index is not None:
+        for rel_path in stale:
+            for doc_id in files[rel_path]["doc_ids"]:
+                index.delete_ref_doc(doc_id, delete_from_docstore=True)
+    for rel_path in stale:
+        del files[rel_path]
+
+    if changed:
+        print(f"📄 {len(changed)}件のPDFを読み込んでいます...")
+    parsed = dict(_parse_in_pool([os.path.join(directory, rel_path) for rel_path, _, _ in changed]))
+    new_documents = []
+    updated_count = 0
+    for rel_path, content_hash, stat in changed:
+        documents = parsed.get(os.path.join(directory, rel_path))
+        if documents is None:
+            continue
+        for i, document in enumerate(documents):
+            document.id_ = f"{rel_path}#{i}"
+            document.metadata["file_name"] = rel_path
+        files[rel_path] = {"hash": content_hash, **stat, "doc_ids": [document.id_ for document in documents]}
+        new_documents.extend(documents)
+        if rel_path in stale:
+            updated_count += 1
+
+    if index is None:
+        print("🧠 インデックスを作成しています...")
+        index = VectorStoreIndex.from_documents(new_documents)
+        dirty = True
+    elif new_documents:
+        print("🧠 インデックスを更新しています...")
+        for document in new_documents:
+            index.insert(document)
+    if dirty or changed:
+        os.makedirs(persist_dir, exist_ok=True)
+        index.storage_context.persist(persist_dir=persist_dir)
+        _save_manifest(persist_dir, manifest)
+
+    added_count = sum(1 for rel_path, _, _ in changed if rel_path in files) - updated_count
+    return index, {"added": added_count, "updated": updated_count, "removed": len(removed)}
+
+
+def corpus_content_hash(directory: str) -> str:
+    """コーパス全体の内容ハッシュ（マニフェストにあるファイルごとのハッシュから作る）"""
+    files = _load_manifest(corpus_cache_dir(directory)).get("files", {})
+    raw = json.dumps(sorted((rel_path, entry["hash"]) for rel_path, entry in files.items()), ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
@@ -4,7 +4,7 @@
 import os
 import csv
 import datetime
-from typing import Optional
+from typing import List, Optional
 
 try:
     from llama_index.core import SimpleDirectoryReader, VectorStoreIndex, Settings
@@ -14,20 +14,73 @@ try:
 except ImportError:
     RAG_AVAILABLE = False
 
+from rag_cache import CHUNK_SIZE, CHUNK_OVERLAP, file_content_hash, index_cache_key, load_cached_index, save_cached_index
+from rag_corpus import corpus_content_hash, load_or_update_corpus_index
+from rag_answer_cache import document_key, get_rag_answer_cache
+from embedding_cache import with_embedding_cache
+from log_writer import get_log_writer
+
+# 1なら回答をトークン単位で逐次表示する
+STREAM_OUTPUT = os.getenv("STREAM_OUTPUT", "1") != "0"
+
 RAG_CSV_FILE = "rag_conversations.csv"
-RAG_CSV_HEADERS = ["timestamp", "pdf_file", "question", "answer"]
+RAG_CSV_HEADERS = ["timestamp", "pdf_file", "question", "answer", "source_documents"]
 
 def initialize_rag_csv() -> None:
+    get_log_writer().flush()
     if not os.path.exists(RAG_CSV_FILE):
         with open(RAG_CSV_FILE, 'w', newline='', encoding='utf-8') as file:
             writer = csv.writer(file)
             writer.writerow(RAG_CSV_HEADERS)
+        return
+    with open(RAG_CSV_FILE, 'r', newline='', encoding='utf-8') as file:
+        rows = list(csv.reader(file))
+    if rows and rows[0] != RAG_CSV_HEADERS:
+        # 旧形式（source_documents列なし）のログに列を追加する
+        with open(RAG_CSV_FILE, 'w', newline='', encoding='utf-8') as file:
+            writer = csv.writer(file)
+            writer.writerow(RAG_CSV_HEADERS)
+            for row in rows[1:]:
+                writer.writerow(row + [""] * (len(RAG_CSV_HEADERS) - len(row)))
+
+def save_rag_conversation(pdf_file: str, question: str, answer: str, source_documents: str = "") -> None:
+    """バッファに積むだけで、書き込みはlog_writerのスレッドがまとめて行う"""
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    get_log_writer().write_row(RAG_CSV_FILE, [timestamp, pdf_file, question, answer, source_documents],
+                               header=RAG_CSV_HEADERS)
 
-def save_rag_conversation(pdf_file: str, question: str, answer: str) -> None:
-    with open(RAG_CSV_FILE, 'a', newline='', encoding='utf-8') as file:
-        writer = csv.writer(file)
-        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        writer.writerow([timestamp, pdf_file, question, answer])
+def format_source_documents(response) -> str:
+    """回答の根拠になったドキュメント名（とページ）を重複なしで並べる"""
+    sources: List[str] = []
+    for node in getattr(response, "source_nodes", None) or []:
+        metadata = node.node.metadata
+        name = metadata.get("file_name", "")
+        if not name:
+            continue
+        page = metadata.get("page_label")
+        label = f"{name} (p.{page})" if page else name
+        if label not in sources:
+            sources.append(label)
+    return "; ".join(sources)
+
+def _load_single_pdf_index(pdf_path: str, content_hash: str, embed_model_name: str):
+    cache_key = index_cache_key(content_hash, CHUNK_SIZE, CHUNK_OVERLAP, embed_model_name)
+    index = load_cached_index(cache_key)
+    if index is not None:
+        print("⚡ キャッシュからインデックスを読み込みました")
+        return index
+
+    print("📄 PDFを読み込んでいます...")
+    documents = SimpleDirectoryReader(input_files=[pdf_path]).load_data()
+
+    if not documents:
+        print("❌ PDFからテキストを抽出できませんでした")
+        return None
+
+    print("🧠 インデックスを作成しています...")
+    index = VectorStoreIndex.from_documents(documents)
+    save_cached_index(index, cache_key, source=os.path.basename(pdf_path))
+    return index
 
 
 def rag_mode() -> None:
@@ -40,29 +93,33 @@ def rag_mode() -> None:
     initialize_rag_csv()
     
     print("\n=== RAGモード ===")
-    print("PDFファイルをアップロードして質問してください")
+    print("PDFファイル（またはPDFをまとめたディレクトリ）を指定して質問してください")
     
-    pdf_path = input("PDFファイルのパスを入力してください: ").strip()
+    pdf_path = input("PDFファイルまたはディレクトリのパスを入力してください: ").strip()
     
     if not os.path.exists(pdf_path):
         print("❌ ファイルが見つかりません")
         return
     
-    if not pdf_path.lower().endswith('.pdf'):
+    corpus_mode = os.path.isdir(pdf_path)
+    if not corpus_mode and not pdf_path.lower().endswith('.pdf'):
         print("❌ PDFファイルを指定してください")
         return
     
     try:
-        print("📄 PDFを読み込んでいます...")
-        documents = SimpleDirectoryReader(input_files=[pdf_path]).load_data()
+        Settings.node_parser = SentenceSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        Settings.embed_model = with_embedding_cache(Settings.embed_model)
+        embed_model_name = getattr(Settings.embed_model, "model_name", "")
 
-        if not documents:
-            print("❌ PDFからテキストを抽出できませんでした")
-            return
-
-        print("🧠 インデックスを作成しています...")
-        Settings.node_parser = SentenceSplitter(chunk_size=512, chunk_overlap=50)
-        index = VectorStoreIndex.from_documents(documents)
+        if corpus_mode:
+            index, changes = load_or_update_corpus_index(pdf_path, embed_model_name)
+            print(f"📚 コーパス更新: 追加{changes['added']}件 / 変更{changes['updated']}件 / 削除{changes['removed']}件")
+            content_hash = corpus_content_hash(pdf_path)
+        else:
+            content_hash = file_content_hash(pdf_path)
+            index = _load_single_pdf_index(pdf_path, content_hash, embed_model_name)
+            if index is None:
+                return
 
         qa_prompt_tmpl = PromptTemplate(
             "あなたは日本語で回答するアシスタントです。"
@@ -71,12 +128,17 @@ def rag_mode() -> None:
             "質問: {query_str}\n"
             "回答:"
         )
-        query_engine = index.as_query_engine(text_qa_template=qa_prompt_tmpl)
+        query_engine = index.as_query_engine(text_qa_template=qa_prompt_tmpl, streaming=STREAM_OUTPUT)
+        # 同じドキュメント・同じ設定への同じ質問は検索も生成もせずに過去の回答を返す
+        answer_cache = get_rag_answer_cache()
+        doc_key = document_key(content_hash, str(CHUNK_SIZE), str(CHUNK_OVERLAP), embed_model_name,
+                               getattr(Settings.llm, "model", ""), qa_prompt_tmpl.get_template())
+        embed_question = Settings.embed_model.get_query_embedding
         
         print("✅ インデックス作成完了！")
         print("\nPDFについて質問してください（'exit'で終了）")
         
-        pdf_filename = os.path.basename(pdf_path)
+        pdf_filename = os.path.basename(os.path.normpath(pdf_path))
         
         while True:
             question = input("\n質問: ").strip()
@@ -88,13 +150,35 @@ def rag_mode() -> None:
                 print("質問を入力してください")
                 continue
             
+            cached, question_embedding = answer_cache.lookup(doc_key, question, embed_question)
+            if cached is not None:
+                answer, source_documents = cached
+                print(f"\n⚡ 回答（キャッシュ）: {answer}")
+                if source_documents:
+                    print(f"📎 出典: {source_documents}")
+                save_rag_conversation(pdf_filename, question, answer, source_documents)
+                continue
+
             print("🤖 回答を生成中...")
             response = query_engine.query(question)
-            answer = str(response)
+            if STREAM_OUTPUT:
+                print("\n回答: ", end="", flush=True)
+                tokens = []
+                for token in response.response_gen:
+                    print(token, end="", flush=True)
+                    tokens.append(token)
+                print()
+                answer = "".join(tokens)
+            else:
+                answer = str(response)
+                print(f"\n回答: {answer}")
             
-            print(f"\n回答: {answer}")
+            source_documents = format_source_documents(response)
+            if source_documents:
+                print(f"📎 出典: {source_documents}")
             
-            save_rag_conversation(pdf_filename, question, answer)
+            answer_cache.put(doc_key, question, answer, source_documents, embed_question, question_embedding)
+            save_rag_conversation(pdf_filename, question, answer, source_documents)
             print("✅ 会話を記録しました")
         
         print("\nRAGモードを終了します")
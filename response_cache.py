@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import json
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+# 1ならメモリに加えてSQLiteにも保存し、再起動後も使えるようにする
+RESPONSE_CACHE_DISK = os.getenv("RESPONSE_CACHE_DISK", "0") == "1"
+RESPONSE_CACHE_DB = os.getenv("RESPONSE_CACHE_DB", "cache/responses.db")
+RESPONSE_CACHE_DISK_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_DISK_MAX_ENTRIES", "5000"))
+
+
+def normalize_prompt(text: str) -> str:
+    """空白の違いだけのプロンプトを同一視する"""
+    return " ".join(text.split())
+
+
+def make_cache_key(messages: List[Tuple[str, str]], model: str, temperature: Optional[float]) -> str:
+    """(role, content)の列とモデル・temperatureからキャッシュキーを作る"""
+    payload = json.dumps({
+        "messages": [[role, normalize_prompt(content)] for role, content in messages],
+        "model": model,
+        "temperature": temperature,
+    }, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    LLM応答のキャッシュ（LRU + TTL、任意でSQLiteのディスク層）
+
+    メモリ層は件数上限を超えると最も長く使われていないものから捨てる。
+    ディスク層はメモリから溢れた応答や再起動後の問い合わせに使う。
+    """
+
+    def __init__(self, max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, ttl: float = RESPONSE_CACHE_TTL,
+                 db_file: Optional[str] = None, disk_max_entries: int = RESPONSE_CACHE_DISK_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_file = db_file
+        self.disk_max_entries = disk_max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _disk(self) -> Optional[sqlite3.Connection]:
+        if not self.db_file:
+            return None
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_file) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses (accessed_at)")
+            self._conn.commit()
+        return self._conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._entries[key]
+            conn = self._disk()
+            if conn is not None:
+                row = conn.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+                if row and row[1] > now:
+                    with conn:
+                        conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+                    self._store_in_memory(key, row[1], row[0])
+                    self.hits += 1
+                    return row[0]
+                if row:
+                    with conn:
+                        conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self.misses += 1
+            return None
+
+    def _store_in_memory(self, key: str, expires_at: float, value: str) -> None:
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._store_in_memory(key, expires_at, value)
+            conn = self._disk()
+            if conn is None:
+                return
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                    (key, value, expires_at, now)
+                )
+                conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+                conn.execute(
+                    "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.disk_max_entries,)
+                )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            conn = self._disk()
+            if conn is not None:
+                with conn:
+                    conn.execute("DELETE FROM responses")
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache(db_file=RESPONSE_CACHE_DB if RESPONSE_CACHE_DISK else None)
+    return _response_cache
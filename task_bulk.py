@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+タスクの一括取り込み・書き出し（CSV / JSONL）
+
+ファイルは1行ずつストリームで読み書きし、取り込みはTASK_IMPORT_CHUNK_SIZE行ごとに
+検証してから1回の書き込みでストアに追加する。数百万行でもメモリ使用量は一定。
+
+使い方:
+    python task_bulk.py import tasks.jsonl
+    python task_bulk.py export backup.csv
+"""
+
+import os
+import re
+import csv
+import sys
+import json
+import argparse
+import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import task_store
+from task_store import CSV_HEADERS
+
+TASK_IMPORT_CHUNK_SIZE = int(os.getenv("TASK_IMPORT_CHUNK_SIZE", "5000"))
+VALID_STATUSES = ("todo", "done")
+
+_DATE_FORMAT = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+def detect_format(path: str, fmt: Optional[str] = None) -> str:
+    if fmt:
+        return fmt
+    return "jsonl" if path.lower().endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def _iter_rows(path: str, fmt: str) -> Iterator[Tuple[int, Optional[Dict[str, str]]]]:
+    """(行番号, 行)を1件ずつ返す。JSONとして読めない行はNone"""
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        if fmt == "csv":
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line_number, line in enumerate(file, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                yield line_number, None
+                continue
+            yield line_number, row if isinstance(row, dict) else None
+
+
+def validate_chunk(rows: List[Tuple[int, Optional[Dict[str, str]]]], created_at: str
+                   ) -> Tuple[List[Dict[str, str]], List[Tuple[int, str]]]:
+    """チャンク内の行を検証し、(取り込むタスク, [(行番号, 理由)])を返す"""
+    tasks = []
+    errors = []
+    for line_number, row in rows:
+        if row is None:
+            errors.append((line_number, "JSONとして読めません"))
+            continue
+        task = {header: str(row.get(header) or "").strip() for header in CSV_HEADERS}
+        if not task["task_name"]:
+            errors.append((line_number, "task_nameが空です"))
+            continue
+        due_date = task["due_date"]
+        if due_date:
+            try:
+                if not _DATE_FORMAT.match(due_date):
+                    raise ValueError
+                datetime.date.fromisoformat(due_date)
+            except ValueError:
+                errors.append((line_number, f"due_dateが不正です: {due_date}"))
+                continue
+        task["status"] = task["status"] or "todo"
+        if task["status"] not in VALID_STATUSES:
+            errors.append((line_number, f"statusが不正です: {task['status']}"))
+            continue
+        task["created_at"] = task["created_at"] or created_at
+        tasks.append(task)
+    return tasks, errors
+
+
+def import_tasks(path: str, fmt: Optional[str] = None, chunk_size: int = TASK_IMPORT_CHUNK_SIZE) -> Dict:
+    """
+    ファイルのタスクを既存のタスクの後ろに追加する
+
+    戻り値は {"imported": 件数, "rejected": 件数, "errors": [(行番号, 理由)]（先頭100件）}。
+    """
+    fmt = detect_format(path, fmt)
+    repository = task_store.get_repository()
+    repository.initialize()
+    created_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    stats = {"imported": 0, "rejected": 0, "errors": []}
+    chunk: List[Tuple[int, Optional[Dict[str, str]]]] = []
+
+    def flush() -> None:
+        tasks, errors = validate_chunk(chunk, created_at)
+        if tasks:
+            repository.add_many(tasks)
+        stats["imported"] += len(tasks)
+        stats["rejected"] += len(errors)
+        stats["errors"].extend(errors[:100 - len(stats["errors"])])
+        chunk.clear()
+
+    for line_number, row in _iter_rows(path, fmt):
+        chunk.append((line_number, row))
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+    return stats
+
+
+def export_tasks(path: str, fmt: Optional[str] = None) -> int:
+    """全タスクをファイルに書き出し、件数を返す"""
+    fmt = detect_format(path, fmt)
+    tmp_path = f"{path}.tmp"
+    count = 0
+    with open(tmp_path, "w", encoding="utf-8", newline="") as file:
+        if fmt == "csv":
+            writer = csv.DictWriter(file, fieldnames=CSV_HEADERS)
+            writer.writeheader()
+        for task in task_store.get_repository().iter_all():
+            if fmt == "csv":
+                writer.writerow(task)
+            else:
+                file.write(json.dumps(task, ensure_ascii=False) + "\n")
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("command", choices=["import", "export"])
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "jsonl"])
+    parser.add_argument("--chunk-size", type=int, default=TASK_IMPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    task_store.initialize_store()
+    if args.command == "export":
+        count = export_tasks(args.path, args.format)
+        print(f"{count}件を書き出しました: {args.path}")
+        return
+
+    if not os.path.exists(args.path):
+        print(f"ファイルが見つかりません: {args.path}")
+        sys.exit(1)
+    stats = import_tasks(args.path, args.format, args.chunk_size)
+    print(f"{stats['imported']}件を取り込みました（不正な行 {stats['rejected']}件）")
+    for line_number, reason in stats["errors"][:10]:
+        print(f"  {line_number}行目: {reason}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,32 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import os
 import datetime
 import re
 import json
-from typing import Tuple
-from langchain_openai import ChatOpenAI
+import asyncio
+import threading
+from typing import Dict, List, Optional, Tuple
 from langchain_core.messages import HumanMessage
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from llm_clients import get_chat_llm, run_async
 
 def extract_task_details_with_llm(task_description: str) -> Tuple[str, str]:
-    """LLMを使ってタスク名と時間情報を正確に抽出"""
-    
+    """
+    タスク名と時間情報を抽出する
+
+    まずルールで抽出し、確信度がRULE_CONFIDENCE_THRESHOLD以上ならLLMは呼ばない。
+    """
+    task_name, time_info, confidence = rule_based_extraction(task_description)
+    with _stats_lock:
+        _stats["total"] += 1
+        if confidence >= RULE_CONFIDENCE_THRESHOLD:
+            _stats["rule"] += 1
+    if confidence >= RULE_CONFIDENCE_THRESHOLD:
+        return task_name, time_info
+
     try:
-        llm = ChatOpenAI(
-            temperature=0.3,
-            model="openai/gpt-3.5-turbo", 
-            openai_api_base="https://openrouter.ai/api/v1",
-            openai_api_key=os.getenv("OPENROUTER_API_KEY")
-        )
+        llm = get_chat_llm("openai/gpt-3.5-turbo", 0.3)
         
         extraction_prompt = f"""
 以下の文章からタスク名と時間情報を抽出してください。
@@ -71,60 +76,229 @@ JSON形式のみで回答:
     return fallback_task_extraction(task_description)
 
 
-def fallback_task_extraction(task_description: str) -> Tuple[str, str]:
-    """フォールバック用タスク抽出（文字列処理）"""
-    
+# 正規表現と除去リストはimport時に1度だけコンパイルする
+_TIME_PATTERNS = [re.compile(pattern) for pattern in (
+    r'明日.*?(\d{1,2}時.*?\d{1,2}時)',
+    r'(\d{1,2}時.*?から.*?\d{1,2}時)',
+    r'(明日|今日|来週|再来週|来月)',
+    r'(\d{1,2}月\d{1,2}日)',
+    r'(\d{4}-\d{2}-\d{2})'
+)]
+
+# カレンダー関連表現（長いものから先に当てる）
+_CLEAN_EXPRESSIONS = re.compile("|".join(re.escape(expr) for expr in sorted([
+    "Google", "をカレンダーに追加", "をスケジュールに入れる", "を予定に入れる",
+    "カレンダーに", "スケジュールに", "予定に", "してほしい", "という予定を追加",
+    "を入れておいて", "と入れておいて", "googleカレンダーに", "Googleカレンダーに"
+], key=len, reverse=True)))
+
+# 時期表現（「今日中に」の「中に」も一緒に除く）
+_TIME_EXPRESSIONS = re.compile("明日中に|今日中に|明日の|明日|今日|再来週|来週|2週間後|来月")
+# 時間情報に含めるべき日付の言葉（時刻だけが取れたときに前に付ける）
+_DATE_WORDS = re.compile(r'明日|今日|再来週|来週|2週間後|来月|\d{1,2}月\d{1,2}日|\d{4}-\d{2}-\d{2}')
+
+# 時間・日付表現
+_TIME_RANGE_PATTERNS = [re.compile(pattern) for pattern in (
+    r'\d{1,2}時.*?から.*?\d{1,2}時.*?まで',
+    r'\d{1,2}時.*?\d{1,2}時',
+    r'\d{1,2}:\d{2}.*?\d{1,2}:\d{2}',
+    r'\d{1,2}時(\d{1,2}分|半)?(から|まで|に)?',
+    r'\d{4}年\d{1,2}月\d{1,2}日',
+    r'\d{1,2}月\d{1,2}日',
+    r'\d{4}-\d{2}-\d{2}',
+    r'\d{1,2}/\d{1,2}'
+)]
+
+# 時期表現を除いたあとに残る助詞（「明日までにレポートを書く」の「までに」など）
+_LEADING_PARTICLES = re.compile(r'^(までに|まで|から|より|の|に|で|は)+')
+_TRAILING_PARTICLES = re.compile(r'(という|を|に|の|と)+$')
+# 時期表現の接尾辞の取り残し（「明日中間…」のように判別できないものはLLMに回す）
+_LEADING_RESIDUE = re.compile(r'^(中|頃|ごろ|以降|以内|じゅう)')
+
+# ルールで取り切れていない兆候（残っていたらLLMに回す）
+_RESIDUAL_TIME = re.compile(r'\d|時|曜|週|月末|午前|午後|朝|昼|夕|晩|夜|深夜|正午|未明|明後日|あさって')
+_RESIDUAL_REQUEST = re.compile(r'入れて|追加|ほしい|登録|カレンダー|スケジュール|予定|お願い')
+_TIME_HINT = re.compile(r'\d|曜|週|月末|午前|午後|明後日|あさって')
+
+RULE_CONFIDENCE_THRESHOLD = float(os.getenv("TASK_RULE_CONFIDENCE_THRESHOLD", "0.7"))
+
+_stats_lock = threading.Lock()
+_stats = {"total": 0, "rule": 0}
+
+
+def rule_based_extraction(task_description: str) -> Tuple[str, str, float]:
+    """
+    正規表現だけでタスク名と時間情報を抽出し、(タスク名, 時間情報, 確信度)を返す
+
+    確信度は0〜1。タスク名に日時や依頼の言い回しが残っている、
+    時間らしき表現があるのに時間情報が取れていない、といった場合に下げる。
+    """
     task_name = task_description
     time_info = ""
-    
+
     # 時間情報を先に抽出
-    time_patterns = [
-        r'明日.*?(\d{1,2}時.*?\d{1,2}時)',
-        r'(\d{1,2}時.*?から.*?\d{1,2}時)',
-        r'(明日|今日|来週|再来週|来月)',
-        r'(\d{1,2}月\d{1,2}日)',
-        r'(\d{4}-\d{2}-\d{2})'
-    ]
-    
-    for pattern in time_patterns:
-        match = re.search(pattern, task_description)
+    for pattern in _TIME_PATTERNS:
+        match = pattern.search(task_description)
         if match:
             time_info = match.group(1) if match.groups() else match.group(0)
             break
-    
-    # カレンダー関連表現をクリーンに
-    clean_expressions = [
-        "Google", "をカレンダーに追加", "をスケジュールに入れる", "を予定に入れる",
-        "カレンダーに", "スケジュールに", "予定に", "してほしい", "という予定を追加",
-        "を入れておいて", "と入れておいて", "googleカレンダーに", "Googleカレンダーに"
-    ]
-    
-    for expr in clean_expressions:
-        task_name = task_name.replace(expr, "")
-    
-    # 時期表現を除去
-    time_expressions = ["明日の", "明日", "今日", "来週", "再来週", "2週間後", "来月"]
-    for expr in time_expressions:
-        task_name = task_name.replace(expr, "")
-    
-    # 時間表現を除去
-    task_name = re.sub(r'\d{1,2}時.*?から.*?\d{1,2}時.*?まで', '', task_name)
-    task_name = re.sub(r'\d{1,2}時.*?\d{1,2}時', '', task_name)
-    task_name = re.sub(r'\d{1,2}:\d{2}.*?\d{1,2}:\d{2}', '', task_name)
-    
-    # 日付表現を除去
-    task_name = re.sub(r'\d{4}年\d{1,2}月\d{1,2}日', '', task_name)
-    task_name = re.sub(r'\d{1,2}月\d{1,2}日', '', task_name)
-    task_name = re.sub(r'\d{4}-\d{2}-\d{2}', '', task_name)
-    task_name = re.sub(r'\d{1,2}/\d{1,2}', '', task_name)
-    
-    task_name = task_name.strip()
-    if not task_name:
-        task_name = task_description
-        
+    # 「明日の13時から14時」で時刻だけが取れた場合は日付の言葉を前に付ける
+    date_match = _DATE_WORDS.search(task_description)
+    if time_info and date_match and date_match.group(0) not in time_info:
+        time_info = f"{date_match.group(0)}{time_info}"
+
+    task_name = _CLEAN_EXPRESSIONS.sub("", task_name)
+    task_name = _TIME_EXPRESSIONS.sub("", task_name)
+    for pattern in _TIME_RANGE_PATTERNS:
+        task_name = pattern.sub("", task_name)
+    task_name = _LEADING_PARTICLES.sub("", task_name.strip())
+    task_name = _TRAILING_PARTICLES.sub("", task_name).strip()
+
+    confidence = 1.0
+    if len(task_name) < 2:
+        task_name = task_name or task_description
+        confidence -= 0.5
+    if _RESIDUAL_TIME.search(task_name):
+        confidence -= 0.4
+    if _RESIDUAL_REQUEST.search(task_name):
+        confidence -= 0.4
+    if not time_info and _TIME_HINT.search(task_description):
+        confidence -= 0.4
+    if any(word not in time_info for word in _DATE_WORDS.findall(task_description)):
+        # タスク名から除いた日付が時間情報に入っていない
+        confidence -= 0.4
+    if _LEADING_RESIDUE.search(task_name):
+        confidence -= 0.4
+
+    return task_name, time_info, max(confidence, 0.0)
+
+
+def fallback_task_extraction(task_description: str) -> Tuple[str, str]:
+    """フォールバック用タスク抽出（文字列処理）"""
+    task_name, time_info, _ = rule_based_extraction(task_description)
     return task_name, time_info
 
 
+def extraction_stats() -> Dict[str, float]:
+    """抽出した件数と、そのうちLLMを呼ばずにルールだけで済んだ割合"""
+    with _stats_lock:
+        total, rule = _stats["total"], _stats["rule"]
+    return {"total": total, "rule_only": rule, "offline_ratio": rule / total if total else 0.0}
+
+
+# バッチ抽出: 1リクエストに詰める件数と文字数の上限、同時に投げるリクエスト数
+BATCH_MAX_ITEMS = int(os.getenv("TASK_EXTRACTION_BATCH_MAX_ITEMS", "20"))
+BATCH_MAX_CHARS = int(os.getenv("TASK_EXTRACTION_BATCH_MAX_CHARS", "2000"))
+BATCH_CONCURRENCY = int(os.getenv("TASK_EXTRACTION_CONCURRENCY", "4"))
+
+_CODE_FENCE = re.compile(r'^```(?:json)?\s*|\s*```$')
+
+
+def _pack_batches(items: List[Tuple[int, str]]) -> List[List[Tuple[int, str]]]:
+    """(番号, 文章)を件数・文字数の上限に収まるように詰める"""
+    batches: List[List[Tuple[int, str]]] = []
+    current: List[Tuple[int, str]] = []
+    size = 0
+    for item in items:
+        if current and (len(current) >= BATCH_MAX_ITEMS or size + len(item[1]) > BATCH_MAX_CHARS):
+            batches.append(current)
+            current, size = [], 0
+        current.append(item)
+        size += len(item[1])
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _batch_prompt(batch: List[Tuple[int, str]]) -> str:
+    items = json.dumps([{"id": i, "text": text} for i, text in batch], ensure_ascii=False)
+    return f"""
+以下の各文章からタスク名と時間情報を抽出してください。
+
+文章リスト: {items}
+
+各文章について、同じidを付けて以下のJSON配列で回答してください:
+[{{"id": 0, "task_name": "純粋なタスク名・イベント名のみ", "time_info": "日時・時間情報（具体的に抽出）"}}]
+
+抽出ルール:
+- task_name: 余計な文言（「Google」「追加してほしい」「という予定を」等）は除去
+- time_info: 「明日13時-14時」のように具体的に。なければ空文字
+
+例:
+「明日までにレポートを書く」→ {{"task_name": "レポートを書く", "time_info": "明日まで"}}
+「来週の火曜日15時から会議をカレンダーに入れて」→ {{"task_name": "会議", "time_info": "来週火曜日15時"}}
+
+JSON配列のみで回答:
+"""
+
+
+def _parse_batch_response(content: str) -> Dict[int, Tuple[str, str]]:
+    """応答のJSON配列をid → (タスク名, 時間情報)にする。形式の崩れた要素は含めない"""
+    try:
+        result = json.loads(_CODE_FENCE.sub("", content.strip()))
+    except json.JSONDecodeError:
+        return {}
+    if not isinstance(result, list):
+        return {}
+    parsed = {}
+    for item in result:
+        if not isinstance(item, dict):
+            continue
+        task_name, time_info = item.get("task_name"), item.get("time_info")
+        if isinstance(item.get("id"), int) and isinstance(task_name, str) and isinstance(time_info, str) and task_name.strip():
+            parsed[item["id"]] = (task_name.strip(), time_info.strip())
+    return parsed
+
+
+async def _aextract_batch(llm, batch: List[Tuple[int, str]], semaphore: asyncio.Semaphore) -> Dict[int, Tuple[str, str]]:
+    async with semaphore:
+        try:
+            response = await llm.ainvoke([HumanMessage(content=_batch_prompt(batch))])
+        except Exception as e:
+            print(f"LLMタスク抽出エラー: {e}")
+            return {}
+    ids = {i for i, _ in batch}
+    return {i: value for i, value in _parse_batch_response(response.content).items() if i in ids}
+
+
+async def aextract_task_details_batch(task_descriptions: List[str]) -> List[Tuple[str, str]]:
+    """
+    複数の文章からまとめて(タスク名, 時間情報)を抽出する
+
+    ルールで確信度が足りたものはLLMに送らない。残りはBATCH_MAX_ITEMS件・
+    BATCH_MAX_CHARS文字ごとに1リクエストへ詰めてJSON配列で受け取り、
+    リクエストは最大BATCH_CONCURRENCY本まで同時に投げる。
+    応答に含まれなかった・形式が崩れていた文章だけを個別にフォールバック抽出する。
+    """
+    results: List[Optional[Tuple[str, str]]] = [None] * len(task_descriptions)
+    pending: List[Tuple[int, str]] = []
+    for i, description in enumerate(task_descriptions):
+        task_name, time_info, confidence = rule_based_extraction(description)
+        if confidence >= RULE_CONFIDENCE_THRESHOLD:
+            results[i] = (task_name, time_info)
+        else:
+            pending.append((i, description))
+    with _stats_lock:
+        _stats["total"] += len(task_descriptions)
+        _stats["rule"] += len(task_descriptions) - len(pending)
+
+    if pending:
+        llm = get_chat_llm("openai/gpt-3.5-turbo", 0.3)
+        semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+        extracted = await asyncio.gather(*(_aextract_batch(llm, batch, semaphore) for batch in _pack_batches(pending)))
+        for batch_result in extracted:
+            for i, value in batch_result.items():
+                results[i] = value
+
+    return [result if result is not None else fallback_task_extraction(task_descriptions[i])
+            for i, result in enumerate(results)]
+
+
+def extract_task_details_batch(task_descriptions: List[str]) -> List[Tuple[str, str]]:
+    """aextract_task_details_batchの同期版"""
+    return run_async(aextract_task_details_batch(task_descriptions))
+
+
 def parse_time_info_to_date(time_info: str) -> str:
     """時間情報を日付形式に変換"""
     if not time_info:
@@ -182,4 +356,6 @@ if __name__ == "__main__":
         print(f"タスク名: {task_name}")
         print(f"時間情報: {time_info}")
         print(f"期限: {due_date}")
-        print("-" * 50)
\ No newline at end of file
+        print("-" * 50)
+    stats = extraction_stats()
+    print(f"LLMを呼ばずに抽出: {stats['rule_only']}/{stats['total']}件 ({stats['offline_ratio']:.0%})")
\ No newline at end of file
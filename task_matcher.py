@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import re
+import heapq
+import unicodedata
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+# 比較の邪魔になる空白・句読点・括弧
+_IGNORED_CHARS = re.compile(r"[\s、。，．,.・！？!?「」『』（）()\[\]【】〜~]+")
+
+
+def normalize_text(text: str) -> str:
+    """全角・半角や大文字・小文字の違いをそろえ、空白と記号を除く"""
+    return _IGNORED_CHARS.sub("", unicodedata.normalize("NFKC", text).lower())
+
+
+def char_ngrams(text: str, n: int = 2) -> Set[str]:
+    """
+    文字n-gramの集合（日本語は分かち書きしないので単語ではなく文字で切る）
+
+    n文字に満たない短い文字列はそれ自体を1つのn-gramとする。
+    """
+    text = normalize_text(text)
+    if len(text) < n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class TaskMatcher:
+    """
+    タスク名の文字bigram転置インデックス
+
+    検索ではヒントのbigramを含むタスクだけを転置リストからたどって数えるので、
+    全タスクを走査せずに上位k件の候補が得られる。
+    候補にするのは、タスク名のbigramがすべてヒントに含まれる（「英語の宿題やった」の中の「英語」）か、
+    ヒントのbigramがすべてタスク名に含まれる（「宿題」と「英語の宿題」）タスクだけ。
+    「さんに電話する」のような言い回しが共通するだけの別タスクは候補にしない。
+    スコアはJaccard係数と1の平均で、長さの近いタスクが上に来る。
+    タスクの追加・完了に合わせてadd/removeで差分更新する。
+    """
+
+    def __init__(self, n: int = 2):
+        self.n = n
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._doc_grams: Dict[int, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._doc_grams)
+
+    def add(self, doc_id: int, text: str) -> None:
+        self.remove(doc_id)
+        grams = char_ngrams(text, self.n)
+        if not grams:
+            return
+        self._doc_grams[doc_id] = grams
+        for gram in grams:
+            self._postings[gram].add(doc_id)
+
+    def remove(self, doc_id: int) -> None:
+        grams = self._doc_grams.pop(doc_id, None)
+        if not grams:
+            return
+        for gram in grams:
+            posting = self._postings[gram]
+            posting.discard(doc_id)
+            if not posting:
+                del self._postings[gram]
+
+    def search(self, query: str, limit: int = 5, min_score: float = 0.0) -> List[Tuple[float, int]]:
+        """(スコア, doc_id)をスコアの高い順に最大limit件返す"""
+        query_grams = char_ngrams(query, self.n)
+        if not query_grams:
+            return []
+        overlaps: Dict[int, int] = defaultdict(int)
+        for gram in query_grams:
+            for doc_id in self._postings.get(gram, ()):
+                overlaps[doc_id] += 1
+        scored = []
+        for doc_id, common in overlaps.items():
+            doc_size = len(self._doc_grams[doc_id])
+            if common < doc_size and common < len(query_grams):
+                # どちらの方向にも含まれていない
+                continue
+            jaccard = common / (len(query_grams) + doc_size - common)
+            score = (1.0 + jaccard) / 2
+            if score >= min_score:
+                scored.append((score, doc_id))
+        return heapq.nlargest(limit, scored, key=lambda item: (item[0], -item[1]))
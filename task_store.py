@@ -0,0 +1,754 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import io
+import csv
+import json
+import bisect
+import hashlib
+import sqlite3
+import threading
+from collections import Counter
+from typing import Iterator, List, Dict, Optional, Tuple
+
+from task_matcher import TaskMatcher
+
+CSV_FILE = "csv/tasks.csv"
+CSV_HEADERS = ["task_name", "due_date", "status", "created_at", "calendar_event_id"]
+JOURNAL_FILE = "csv/tasks.journal"
+DB_FILE = os.getenv("TASK_DB_FILE", "csv/tasks.db")
+
+# "journal": 変更をジャーナルに追記し、閾値を超えたらtasks.csvへ畳み込む
+# "csv": 変更のたびにtasks.csvを全体書き換えする従来方式
+# "sqlite": status・due_date・calendar_event_idにインデックスを張ったSQLite
+STORAGE_BACKEND = os.getenv("TASK_STORAGE_BACKEND", "journal")
+COMPACT_THRESHOLD = int(os.getenv("TASK_JOURNAL_COMPACT_THRESHOLD", "500"))
+
+
+def _normalize_task(row: Dict[str, str]) -> Dict[str, str]:
+    return {header: row.get(header) or "" for header in CSV_HEADERS}
+
+
+def _iter_csv(csv_file: str) -> Iterator[Dict[str, str]]:
+    try:
+        with open(csv_file, 'r', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                yield _normalize_task(row)
+    except FileNotFoundError:
+        return
+
+
+def _read_csv(csv_file: str) -> List[Dict[str, str]]:
+    return list(_iter_csv(csv_file))
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _write_csv(csv_file: str, tasks: List[Dict[str, str]]) -> None:
+    with open(csv_file, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=CSV_HEADERS)
+        writer.writeheader()
+        writer.writerows(_normalize_task(task) for task in tasks)
+
+
+def _write_csv_atomic(csv_file: str, tasks: List[Dict[str, str]]) -> None:
+    """一時ファイルに書き出してから置き換える（途中で落ちても元ファイルは壊れない）"""
+    tmp_file = f"{csv_file}.tmp"
+    _write_csv(tmp_file, tasks)
+    os.replace(tmp_file, csv_file)
+
+
+def _append_csv_rows(csv_file: str, tasks: List[Dict[str, str]]) -> None:
+    """既存のCSVの末尾に行を追加する（チャンク全体を1回のwriteで書く）"""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_HEADERS)
+    if not os.path.exists(csv_file) or os.path.getsize(csv_file) == 0:
+        writer.writeheader()
+    writer.writerows(_normalize_task(task) for task in tasks)
+    with open(csv_file, 'a', newline='', encoding='utf-8') as file:
+        file.write(buffer.getvalue())
+
+
+class CsvTaskBackend:
+    """変更のたびにtasks.csvを全体書き換えする従来方式"""
+
+    def __init__(self, csv_file: str = CSV_FILE):
+        self.csv_file = csv_file
+
+    def initialize(self) -> None:
+        os.makedirs(os.path.dirname(self.csv_file) or ".", exist_ok=True)
+        if not os.path.exists(self.csv_file):
+            _write_csv_atomic(self.csv_file, [])
+
+    def exists(self) -> bool:
+        return os.path.exists(self.csv_file)
+
+    def load(self) -> List[Dict[str, str]]:
+        return _read_csv(self.csv_file)
+
+    def signature(self) -> Tuple:
+        return (_file_signature(self.csv_file),)
+
+    def append(self, task: Dict[str, str]) -> None:
+        tasks = self.load()
+        tasks.append(task)
+        _write_csv_atomic(self.csv_file, tasks)
+
+    def append_many(self, tasks: List[Dict[str, str]]) -> None:
+        _append_csv_rows(self.csv_file, tasks)
+
+    def iter_tasks(self) -> Iterator[Dict[str, str]]:
+        return _iter_csv(self.csv_file)
+
+    def update(self, index: int, fields: Dict[str, str], current: Optional[Dict[str, str]] = None) -> None:
+        tasks = self.load()
+        if 0 <= index < len(tasks):
+            tasks[index].update(fields)
+            _write_csv_atomic(self.csv_file, tasks)
+
+    def replace_all(self, tasks: List[Dict[str, str]]) -> None:
+        _write_csv_atomic(self.csv_file, tasks)
+
+    def compact(self) -> None:
+        pass
+
+
+class JournalTaskBackend:
+    """
+    追記型ジャーナル付きタスクストア
+
+    tasks.csvをスナップショットとし、追加・更新は1行のJSONレコードとして
+    ジャーナルに追記する。現在の状態はスナップショットにジャーナルを再生して復元し、
+    レコード数が閾値を超えたらバックグラウンドでスナップショットへ畳み込む。
+
+    畳み込みは 新しいスナップショットを tasks.csv.next に書く →
+    ジャーナルを tasks.journal.compacting に改名 → tasks.csv を置き換え →
+    .compacting を削除 の順に行う。途中で落ちた場合は次の読み込み時に、
+    .compacting が残っていれば .next の有無で置き換え前か後かを判断して続きを行う。
+
+    ジャーナル先頭の"base"レコードには作成時のスナップショットのハッシュと行数を記録する。
+    tasks.csv が手で編集されてハッシュが合わなくなっていたら、更新レコードの行番号は使わず、
+    ジャーナルで追加した行はずらして、元からあった行は更新前のタスク名と作成日時（"key"）で
+    探して適用し、その場で新しいスナップショットに畳み込む。レコードは捨てない。
+    """
+
+    def __init__(self, csv_file: str = CSV_FILE, journal_file: str = JOURNAL_FILE,
+                 compact_threshold: int = COMPACT_THRESHOLD):
+        self.csv_file = csv_file
+        self.journal_file = journal_file
+        self.next_snapshot_file = f"{csv_file}.next"
+        self.compacting_file = f"{journal_file}.compacting"
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._journal_records: Optional[int] = None
+        # 現在のtasks.csvの(ハッシュ, 行数)
+        self._snapshot: Optional[Tuple[str, int]] = None
+        self._compaction_thread: Optional[threading.Thread] = None
+
+    def initialize(self) -> None:
+        os.makedirs(os.path.dirname(self.csv_file) or ".", exist_ok=True)
+        with self._lock:
+            self._recover()
+        if not os.path.exists(self.csv_file):
+            _write_csv_atomic(self.csv_file, [])
+
+    def exists(self) -> bool:
+        return os.path.exists(self.csv_file)
+
+    def _recover(self) -> None:
+        """途中で落ちた畳み込みを完了させる"""
+        if os.path.exists(self.compacting_file):
+            if os.path.exists(self.next_snapshot_file):
+                # ジャーナルの改名後、tasks.csvの置き換え前に落ちた
+                os.replace(self.next_snapshot_file, self.csv_file)
+            # .compacting の内容はtasks.csvに反映済み
+            os.remove(self.compacting_file)
+        elif os.path.exists(self.next_snapshot_file):
+            # ジャーナルの改名前に落ちた（ジャーナルはそのまま有効）
+            os.remove(self.next_snapshot_file)
+
+    def load(self) -> List[Dict[str, str]]:
+        with self._lock:
+            self._recover()
+            try:
+                with open(self.csv_file, 'rb') as file:
+                    data = file.read()
+            except FileNotFoundError:
+                data = b""
+            tasks = [_normalize_task(row) for row in csv.DictReader(io.StringIO(data.decode('utf-8'), newline=''))]
+            self._snapshot = (hashlib.sha1(data).hexdigest(), len(tasks))
+            self._journal_records, edited = self._replay(tasks)
+            if edited:
+                print("tasks.csvが編集されていたため、ジャーナルをタスクの内容で照合して畳み込みました")
+                self._install_snapshot(tasks)
+            return tasks
+
+    def signature(self) -> Tuple:
+        return (_file_signature(self.csv_file), _file_signature(self.journal_file))
+
+    def _replay(self, tasks: List[Dict[str, str]]) -> Tuple[int, bool]:
+        """ジャーナルをtasksに適用し、(レコード数, スナップショットが編集されていたか)を返す"""
+        records = 0
+        edited = False
+        base_rows = snapshot_rows = len(tasks)
+        try:
+            with open(self.journal_file, 'r', encoding='utf-8') as file:
+                for line in file:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # 書き込み途中で落ちた末尾行は無視
+                        break
+                    op = record.get("op")
+                    if op == "base":
+                        # 旧形式（行数だけ）のbaseレコードは照合しない
+                        if "sha" in record and record["sha"] != self._snapshot[0]:
+                            edited = True
+                            base_rows = record.get("rows", 0)
+                        continue
+                    if op == "add":
+                        tasks.append(_normalize_task(record.get("task", {})))
+                    elif op == "update":
+                        index = record.get("index", -1)
+                        if edited:
+                            index = self._rebase_index(tasks, record, base_rows, snapshot_rows)
+                        if 0 <= index < len(tasks):
+                            tasks[index].update(record.get("fields", {}))
+                    records += 1
+        except FileNotFoundError:
+            pass
+        return records, edited
+
+    @staticmethod
+    def _rebase_index(tasks: List[Dict[str, str]], record: Dict, base_rows: int, snapshot_rows: int) -> int:
+        """編集後のスナップショットで、更新レコードが指していた行の番号を返す（見つからなければ-1）"""
+        index = record.get("index", -1)
+        if index >= base_rows:
+            # ジャーナルで追加した行は、スナップショットの行数の差だけずれる
+            return index - base_rows + snapshot_rows
+        key = record.get("key")
+        if key:
+            for i in range(snapshot_rows):
+                task = tasks[i]
+                if task["task_name"] == key.get("task_name") and task["created_at"] == key.get("created_at"):
+                    return i
+        print(f"tasks.csvの編集により、ジャーナルの更新を適用できませんでした: {json.dumps(record, ensure_ascii=False)}")
+        return -1
+
+    def _install_snapshot(self, tasks: List[Dict[str, str]]) -> None:
+        """tasksを新しいスナップショットにし、それまでのジャーナルを捨てる"""
+        _write_csv(self.next_snapshot_file, tasks)
+        snapshot = (_file_digest(self.next_snapshot_file), len(tasks))
+        if os.path.exists(self.journal_file):
+            os.replace(self.journal_file, self.compacting_file)
+        os.replace(self.next_snapshot_file, self.csv_file)
+        try:
+            os.remove(self.compacting_file)
+        except FileNotFoundError:
+            pass
+        self._snapshot = snapshot
+        self._journal_records = 0
+
+    def _write_record(self, record: Dict) -> None:
+        with self._lock:
+            if self._journal_records is None or self._snapshot is None:
+                self.load()
+            lines = []
+            if not os.path.exists(self.journal_file) or os.path.getsize(self.journal_file) == 0:
+                sha, rows = self._snapshot
+                lines.append(json.dumps({"op": "base", "sha": sha, "rows": rows}))
+            lines.append(json.dumps(record, ensure_ascii=False))
+            with open(self.journal_file, 'a', encoding='utf-8') as file:
+                file.write("\n".join(lines) + "\n")
+            self._journal_records += 1
+            should_compact = self._journal_records >= self.compact_threshold
+        if should_compact:
+            self._start_background_compaction()
+
+    def append(self, task: Dict[str, str]) -> None:
+        self._write_record({"op": "add", "task": _normalize_task(task)})
+
+    def update(self, index: int, fields: Dict[str, str], current: Optional[Dict[str, str]] = None) -> None:
+        """currentは更新前のタスク（tasks.csvが手で編集されたときに行を探すのに使う）。省略時は読み込んで取る"""
+        record = {"op": "update", "index": index, "fields": fields}
+        if current is None:
+            with self._lock:
+                tasks = self.load()
+                current = tasks[index] if 0 <= index < len(tasks) else None
+        if current is not None:
+            record["key"] = {"task_name": current.get("task_name", ""), "created_at": current.get("created_at", "")}
+        self._write_record(record)
+
+    def append_many(self, tasks: List[Dict[str, str]]) -> None:
+        """
+        まとめて追加する（一括取り込み用）
+
+        大量のレコードをジャーナルに積むと畳み込み時に全件をメモリに載せることになるため、
+        ジャーナルを先に畳み込んでから、スナップショットの末尾へ直接追記する。
+        ジャーナルが空ならスナップショットは読まないので、チャンクごとに呼んでも追記分しか書かない。
+        """
+        # 畳み込みスレッドは_lockを取りに来るので、_lockを持つ前に終わるのを待つ
+        self.wait_for_compaction()
+        with self._lock:
+            self.compact()
+            _append_csv_rows(self.csv_file, tasks)
+            # 次の追記時に読み直してbaseレコードのハッシュを取る
+            self._snapshot = None
+
+    def iter_tasks(self) -> Iterator[Dict[str, str]]:
+        self.wait_for_compaction()
+        with self._lock:
+            self.compact()
+        return _iter_csv(self.csv_file)
+
+    def replace_all(self, tasks: List[Dict[str, str]]) -> None:
+        with self._lock:
+            self._recover()
+            self._install_snapshot(tasks)
+
+    def compact(self) -> None:
+        """ジャーナルをスナップショット（tasks.csv）へ畳み込む"""
+        with self._lock:
+            self._recover()
+            if not os.path.exists(self.journal_file):
+                return
+            self._install_snapshot(self.load())
+
+    def _start_background_compaction(self) -> None:
+        with self._lock:
+            if self._compaction_thread and self._compaction_thread.is_alive():
+                return
+            self._compaction_thread = threading.Thread(target=self.compact, daemon=True)
+            self._compaction_thread.start()
+
+    def wait_for_compaction(self) -> None:
+        thread = self._compaction_thread
+        if thread:
+            thread.join()
+
+
+class SqliteTaskBackend:
+    """
+    SQLiteによるタスクストア
+
+    status・due_date・calendar_event_idにインデックスを張るので、
+    ステータスでの絞り込みや件数取得は全件走査せずに済む。
+    行番号はid - 1に対応する（タスクは削除しないので連番が保たれる）。
+    初回作成時にtasks.csvがあれば取り込み、compact時にtasks.csvへ書き出す。
+    """
+
+    indexed = True
+
+    def __init__(self, db_file: str = DB_FILE, csv_file: str = CSV_FILE):
+        self.db_file = db_file
+        self.csv_file = csv_file
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_file) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            columns = ", ".join(f"{header} TEXT NOT NULL DEFAULT ''" for header in CSV_HEADERS)
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS tasks (id INTEGER PRIMARY KEY, {columns})")
+            for column in ("status", "due_date", "calendar_event_id"):
+                self._conn.execute(f"CREATE INDEX IF NOT EXISTS idx_tasks_{column} ON tasks ({column})")
+            self._conn.commit()
+        return self._conn
+
+    def initialize(self) -> None:
+        with self._lock:
+            is_new = not os.path.exists(self.db_file)
+            self._connection()
+            if is_new and os.path.exists(self.csv_file):
+                self.import_csv(self.csv_file)
+
+    def exists(self) -> bool:
+        return os.path.exists(self.db_file)
+
+    def signature(self) -> Tuple:
+        return (_file_signature(self.db_file),)
+
+    @staticmethod
+    def _row_to_task(row: sqlite3.Row) -> Dict[str, str]:
+        return {header: row[header] for header in CSV_HEADERS}
+
+    def load(self) -> List[Dict[str, str]]:
+        with self._lock:
+            rows = self._connection().execute(f"SELECT {', '.join(CSV_HEADERS)} FROM tasks ORDER BY id")
+            return [self._row_to_task(row) for row in rows]
+
+    def query(self, status: Optional[str] = None) -> List[Tuple[int, Dict[str, str]]]:
+        with self._lock:
+            sql = f"SELECT id, {', '.join(CSV_HEADERS)} FROM tasks"
+            params: Tuple = ()
+            if status:
+                sql += " WHERE status = ?"
+                params = (status,)
+            rows = self._connection().execute(sql + " ORDER BY id", params)
+            return [(row["id"] - 1, self._row_to_task(row)) for row in rows]
+
+    def count(self, status: Optional[str] = None) -> int:
+        with self._lock:
+            if status:
+                row = self._connection().execute("SELECT COUNT(*) FROM tasks WHERE status = ?", (status,)).fetchone()
+            else:
+                row = self._connection().execute("SELECT COUNT(*) FROM tasks").fetchone()
+            return row[0]
+
+    def status_counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._connection().execute("SELECT status, COUNT(*) FROM tasks GROUP BY status")
+            return {row[0]: row[1] for row in rows}
+
+    def get(self, index: int) -> Optional[Dict[str, str]]:
+        with self._lock:
+            row = self._connection().execute(f"SELECT {', '.join(CSV_HEADERS)} FROM tasks WHERE id = ?", (index + 1,)).fetchone()
+            return self._row_to_task(row) if row else None
+
+    def next_due(self, limit: int, from_date: str = "") -> List[Tuple[int, Dict[str, str]]]:
+        with self._lock:
+            rows = self._connection().execute(
+                f"SELECT id, {', '.join(CSV_HEADERS)} FROM tasks "
+                "WHERE due_date >= ? AND due_date != '' AND status = 'todo' ORDER BY due_date, id LIMIT ?",
+                (from_date, limit)
+            )
+            return [(row["id"] - 1, self._row_to_task(row)) for row in rows]
+
+    def _insert_many(self, conn: sqlite3.Connection, tasks) -> None:
+        placeholders = ", ".join("?" for _ in CSV_HEADERS)
+        conn.executemany(
+            f"INSERT INTO tasks ({', '.join(CSV_HEADERS)}) VALUES ({placeholders})",
+            ([_normalize_task(task)[header] for header in CSV_HEADERS] for task in tasks)
+        )
+
+    def append(self, task: Dict[str, str]) -> None:
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                self._insert_many(conn, [task])
+
+    def append_many(self, tasks: List[Dict[str, str]]) -> None:
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                self._insert_many(conn, tasks)
+
+    def iter_tasks(self) -> Iterator[Dict[str, str]]:
+        """別の接続でカーソルを回すので、書き出し中も他の操作をブロックしない"""
+        self._connection()
+        conn = sqlite3.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        try:
+            for row in conn.execute(f"SELECT {', '.join(CSV_HEADERS)} FROM tasks ORDER BY id"):
+                yield self._row_to_task(row)
+        finally:
+            conn.close()
+
+    def update(self, index: int, fields: Dict[str, str], current: Optional[Dict[str, str]] = None) -> None:
+        columns = [key for key in fields if key in CSV_HEADERS]
+        if not columns:
+            return
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                assignments = ", ".join(f"{column} = ?" for column in columns)
+                conn.execute(f"UPDATE tasks SET {assignments} WHERE id = ?", [fields[column] or "" for column in columns] + [index + 1])
+
+    def replace_all(self, tasks: List[Dict[str, str]]) -> None:
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM tasks")
+                self._insert_many(conn, tasks)
+
+    def import_csv(self, csv_file: str = CSV_FILE) -> None:
+        """CSVの内容でテーブルを置き換える"""
+        self.replace_all(_read_csv(csv_file))
+
+    def export_csv(self, csv_file: str = CSV_FILE) -> None:
+        _write_csv_atomic(csv_file, self.load())
+
+    def compact(self) -> None:
+        self.export_csv(self.csv_file)
+
+
+class TaskIndex:
+    """
+    ステータス別の件数と、未完了タスクの期限順インデックス
+
+    追加・更新のたびに差分で更新するので、件数はO(1)、
+    「次に期限が来るN件」はO(log n + N)で取得できる。
+    """
+
+    def __init__(self):
+        self.status_counts: Counter = Counter()
+        self.total = 0
+        # 期限付き未完了タスクの(due_date, 行番号)を昇順に保持
+        self.due_entries: List[Tuple[str, int]] = []
+        # 未完了タスク名の文字bigram転置インデックス
+        self.matcher = TaskMatcher()
+
+    @classmethod
+    def build(cls, tasks: List[Dict[str, str]]) -> "TaskIndex":
+        index = cls()
+        index.status_counts = Counter(task.get("status", "") for task in tasks)
+        index.total = len(tasks)
+        index.due_entries = sorted(
+            (task["due_date"], i) for i, task in enumerate(tasks)
+            if task.get("status") == "todo" and task.get("due_date")
+        )
+        for i, task in enumerate(tasks):
+            if task.get("status") == "todo":
+                index.matcher.add(i, task.get("task_name", ""))
+        return index
+
+    def add(self, index: int, task: Dict[str, str]) -> None:
+        self.status_counts[task.get("status", "")] += 1
+        self.total += 1
+        if task.get("status") == "todo" and task.get("due_date"):
+            bisect.insort(self.due_entries, (task["due_date"], index))
+        if task.get("status") == "todo":
+            self.matcher.add(index, task.get("task_name", ""))
+
+    def remove(self, index: int, task: Dict[str, str]) -> None:
+        self.status_counts[task.get("status", "")] -= 1
+        self.total -= 1
+        if task.get("status") == "todo" and task.get("due_date"):
+            entry = (task["due_date"], index)
+            pos = bisect.bisect_left(self.due_entries, entry)
+            if pos < len(self.due_entries) and self.due_entries[pos] == entry:
+                del self.due_entries[pos]
+        self.matcher.remove(index)
+
+    def count(self, status: Optional[str] = None) -> int:
+        return self.status_counts[status] if status else self.total
+
+    def next_due(self, limit: int, from_date: str = "") -> List[Tuple[str, int]]:
+        start = bisect.bisect_left(self.due_entries, (from_date, -1))
+        return self.due_entries[start:start + limit]
+
+
+class TaskRepository:
+    """
+    プロセス内で共有するタスクリポジトリ
+
+    読み込んだタスクをメモリに保持し、ファイルのmtimeとサイズが変わったとき
+    （他プロセスや手作業での編集時）だけ再パースする。
+    自分で行った変更はメモリ上にも反映するので再パースは発生しない。
+    返すタスクはコピーなので、呼び出し側で書き換えてもキャッシュとインデックスは変わらない
+    （変更はupdate()・replace_all()で行う）。
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.RLock()
+        self._tasks: Optional[List[Dict[str, str]]] = None
+        self._signature: Optional[Tuple] = None
+        self._index: Optional[TaskIndex] = None
+        # インデックス付きバックエンドでは件数だけを差分更新で保持する
+        self._counts: Optional[Counter] = None
+        self._counts_signature: Optional[Tuple] = None
+
+    def _cache_valid(self) -> bool:
+        return self._tasks is not None and self.backend.signature() == self._signature
+
+    def _ensure_loaded(self) -> List[Dict[str, str]]:
+        if not self._cache_valid():
+            self._tasks = self.backend.load()
+            self._index = TaskIndex.build(self._tasks)
+            self._signature = self.backend.signature()
+        return self._tasks
+
+    def _ensure_counts(self) -> Counter:
+        signature = self.backend.signature()
+        if self._counts is None or signature != self._counts_signature:
+            self._counts = Counter(self.backend.status_counts())
+            self._counts_signature = signature
+        return self._counts
+
+    def _indexed(self) -> bool:
+        return getattr(self.backend, "indexed", False)
+
+    def initialize(self) -> None:
+        with self._lock:
+            self.backend.initialize()
+
+    def exists(self) -> bool:
+        return self.backend.exists()
+
+    def all(self) -> List[Dict[str, str]]:
+        with self._lock:
+            return [dict(task) for task in self._ensure_loaded()]
+
+    def filter(self, status: Optional[str] = None) -> List[Tuple[int, Dict[str, str]]]:
+        """(行番号, タスク)のリストを返す"""
+        with self._lock:
+            if self._indexed():
+                return self.backend.query(status)
+            return [(i, dict(task)) for i, task in enumerate(self._ensure_loaded()) if not status or task.get("status") == status]
+
+    def count(self, status: Optional[str] = None) -> int:
+        with self._lock:
+            if self._indexed():
+                counts = self._ensure_counts()
+                return counts[status] if status else sum(counts.values())
+            self._ensure_loaded()
+            return self._index.count(status)
+
+    def next_due(self, limit: int = 5, from_date: str = "") -> List[Tuple[int, Dict[str, str]]]:
+        """期限の近い未完了タスクを(行番号, タスク)のリストで返す"""
+        with self._lock:
+            if self._indexed():
+                return self.backend.next_due(limit, from_date)
+            tasks = self._ensure_loaded()
+            return [(i, dict(tasks[i])) for _, i in self._index.next_due(limit, from_date)]
+
+    def match(self, hint: str, limit: int = 5, min_score: float = 0.0) -> List[Tuple[float, int, Dict[str, str]]]:
+        """タスク名がhintに近い未完了タスクを(スコア, 行番号, タスク)のリストで返す"""
+        with self._lock:
+            tasks = self._ensure_loaded()
+            return [(score, i, dict(tasks[i])) for score, i in self._index.matcher.search(hint, limit, min_score)]
+
+    def add(self, task: Dict[str, str]) -> None:
+        with self._lock:
+            task = _normalize_task(task)
+            cache_valid = self._cache_valid()
+            counts_valid = self._counts is not None and self.backend.signature() == self._counts_signature
+            self.backend.append(task)
+            signature = self.backend.signature()
+            if cache_valid:
+                self._tasks.append(task)
+                self._index.add(len(self._tasks) - 1, task)
+                self._signature = signature
+            if counts_valid:
+                self._counts[task["status"]] += 1
+                self._counts_signature = signature
+
+    def update(self, index: int, fields: Dict[str, str]) -> None:
+        with self._lock:
+            cache_valid = self._cache_valid()
+            counts_valid = self._counts is not None and self.backend.signature() == self._counts_signature
+            old_status = None
+            if counts_valid:
+                old_task = self.backend.get(index)
+                old_status = old_task["status"] if old_task else None
+            # 呼び出し側が見ていた行（ジャーナルが手編集後に行を探すのに使う）
+            current = dict(self._tasks[index]) if self._tasks is not None and 0 <= index < len(self._tasks) else None
+            self.backend.update(index, fields, current)
+            signature = self.backend.signature()
+            if cache_valid and 0 <= index < len(self._tasks):
+                task = self._tasks[index]
+                self._index.remove(index, task)
+                task.update(fields)
+                self._index.add(index, task)
+                self._signature = signature
+            if counts_valid and old_status is not None and "status" in fields:
+                self._counts[old_status] -= 1
+                self._counts[fields["status"]] += 1
+                self._counts_signature = signature
+            elif counts_valid:
+                self._counts_signature = signature
+
+    def add_many(self, tasks: List[Dict[str, str]]) -> None:
+        """
+        まとめて追加する（1回の書き込み）
+
+        一括取り込みでメモリ上のキャッシュが膨らまないよう、キャッシュは捨てて次回読み直す。
+        """
+        with self._lock:
+            self.backend.append_many(tasks)
+            self._tasks = None
+            self._index = None
+            self._counts = None
+
+    def iter_all(self) -> Iterator[Dict[str, str]]:
+        """全タスクを1件ずつ返す（全件をメモリに載せない）"""
+        return self.backend.iter_tasks()
+
+    def replace_all(self, tasks: List[Dict[str, str]]) -> None:
+        with self._lock:
+            self.backend.replace_all(tasks)
+            self._tasks = [_normalize_task(task) for task in tasks]
+            self._index = TaskIndex.build(self._tasks)
+            self._signature = self.backend.signature()
+            self._counts = None
+
+    def compact(self) -> None:
+        with self._lock:
+            if isinstance(self.backend, JournalTaskBackend):
+                self.backend.wait_for_compaction()
+            self.backend.compact()
+
+
+_repository: Optional[TaskRepository] = None
+_repository_lock = threading.Lock()
+
+
+def get_repository() -> TaskRepository:
+    """main.pyとintegrated_langchain.pyで共有するリポジトリを返す"""
+    global _repository
+    with _repository_lock:
+        if _repository is None:
+            if STORAGE_BACKEND == "csv":
+                backend = CsvTaskBackend()
+            elif STORAGE_BACKEND == "sqlite":
+                backend = SqliteTaskBackend()
+            else:
+                backend = JournalTaskBackend()
+            _repository = TaskRepository(backend)
+        return _repository
+
+
+def initialize_store() -> None:
+    get_repository().initialize()
+
+
+def read_tasks() -> List[Dict[str, str]]:
+    return get_repository().all()
+
+
+def add_task_record(task: Dict[str, str]) -> None:
+    get_repository().add(task)
+
+
+def update_task_record(index: int, fields: Dict[str, str]) -> None:
+    get_repository().update(index, fields)
+
+
+def write_tasks(tasks: List[Dict[str, str]]) -> None:
+    get_repository().replace_all(tasks)
+
+
+def compact_store() -> None:
+    get_repository().compact()
+
+
+def import_csv_to_store(csv_file: str = CSV_FILE) -> None:
+    """CSVファイルの内容で現在のストアを置き換える"""
+    get_repository().replace_all(_read_csv(csv_file))
+
+
+def export_store_to_csv(csv_file: str) -> None:
+    """現在のストアの内容をCSV_HEADERS形式のCSVに書き出す"""
+    _write_csv_atomic(csv_file, get_repository().all())
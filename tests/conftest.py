@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """フェイクのCalendar APIサーバー（バッチの送り先もここに向ける）"""
+    pytest.importorskip("googleapiclient")
+    pytest.importorskip("google_auth_oauthlib")
+    import calendar_cache
+    from fake_calendar_server import FakeCalendarServer
+    server = FakeCalendarServer().start()
+    monkeypatch.setattr(calendar_cache, "CALENDAR_API_ENDPOINT", server.url)
+    yield server
+    server.stop()
+
+
+@pytest.fixture
+def service(server):
+    from google.auth.credentials import AnonymousCredentials
+    from googleapiclient.discovery import build
+    return build("calendar", "v3", credentials=AnonymousCredentials(),
+                 client_options={"api_endpoint": server.url}, static_discovery=True)
@@ -0,0 +1,44 @@
+import datetime
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+pytest.importorskip("google_auth_oauthlib")
+
+from calendar_cache import CalendarEventCache
+
+
+def _date(days):
+    return (datetime.date.today() + datetime.timedelta(days=days)).isoformat()
+
+
+@pytest.fixture
+def event_cache(tmp_path):
+    return CalendarEventCache(str(tmp_path / "calendar_events.json"))
+
+
+def test_event_cache_incremental_sync(server, service, event_cache):
+    first = server.add_event("会議", _date(1))
+    server.add_event("歯医者", _date(2))
+    event_cache.sync(service, force=True)
+    assert sorted(event["summary"] for event in event_cache.events.values()) == ["会議", "歯医者"]
+
+    server.add_event("飲み会", _date(3))
+    server.state.delete_event("primary", first["id"])
+    before = server.state.request_count
+    event_cache.sync(service, force=True)
+
+    assert server.state.request_count - before == 1
+    assert sorted(event["summary"] for event in event_cache.events.values()) == ["歯医者", "飲み会"]
+    assert [event["summary"] for event in event_cache.search("飲み", days=7)] == ["飲み会"]
+
+
+def test_event_cache_full_resync_on_expired_token(server, service, event_cache):
+    server.add_event("会議", _date(1))
+    event_cache.sync(service, force=True)
+    server.state.expire_sync_tokens()
+    server.add_event("歯医者", _date(2))
+
+    event_cache.sync(service, force=True)
+
+    assert sorted(event["summary"] for event in event_cache.events.values()) == ["会議", "歯医者"]
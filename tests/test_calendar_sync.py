@@ -0,0 +1,102 @@
+import datetime
+
+import pytest
+
+pytest.importorskip("googleapiclient")
+pytest.importorskip("google_auth_oauthlib")
+
+import calendar_sync
+import task_store
+from calendar_cache import CalendarEventCache
+from task_store import JournalTaskBackend, TaskRepository
+
+
+def _date(days):
+    return (datetime.date.today() + datetime.timedelta(days=days)).isoformat()
+
+
+def _task(name, due_date, status="todo", calendar_event_id=""):
+    return {"task_name": name, "due_date": due_date, "status": status,
+            "created_at": "2025-01-01 00:00:00", "calendar_event_id": calendar_event_id}
+
+
+@pytest.fixture
+def event_cache(tmp_path, monkeypatch):
+    cache = CalendarEventCache(str(tmp_path / "calendar_events.json"))
+    monkeypatch.setattr(calendar_sync, "get_event_cache", lambda: cache)
+    return cache
+
+
+@pytest.fixture
+def repository(tmp_path, monkeypatch):
+    backend = JournalTaskBackend(str(tmp_path / "tasks.csv"), str(tmp_path / "tasks.journal"))
+    repository = TaskRepository(backend)
+    repository.initialize()
+    monkeypatch.setattr(task_store, "_repository", repository)
+    monkeypatch.setattr(calendar_sync, "CALENDAR_SYNC_STATE_FILE", str(tmp_path / "calendar_sync.json"))
+    return repository
+
+
+def test_sync_creates_pushes_pulls_and_completes(server, service, event_cache, repository):
+    repository.replace_all([_task("買い物", _date(1)), _task("掃除", _date(2)), _task("期限なし", "")])
+    stats = calendar_sync.sync_tasks_with_calendar(service)
+    assert stats["created"] == 2
+    tasks = repository.all()
+    shopping_id, cleaning_id = tasks[0]["calendar_event_id"], tasks[1]["calendar_event_id"]
+    assert shopping_id and cleaning_id and not tasks[2]["calendar_event_id"]
+
+    # タスク側の変更は予定へ、予定側の変更はタスクへ、予定の削除はタスクの完了へ
+    repository.update(0, {"status": "done"})
+    server.state.put_event("primary", {**server.state.get_event("primary", cleaning_id), "summary": "大掃除"})
+    stats = calendar_sync.sync_tasks_with_calendar(service)
+    assert (stats["pushed"], stats["pulled"]) == (1, 1)
+    assert server.state.get_event("primary", shopping_id)["summary"] == "✅ 買い物"
+    assert repository.all()[1]["task_name"] == "大掃除"
+
+    server.state.delete_event("primary", cleaning_id)
+    stats = calendar_sync.sync_tasks_with_calendar(service)
+    assert stats["completed"] == 1
+    assert repository.all()[1]["status"] == "done"
+
+
+def test_sync_batches_requests(server, service, event_cache, repository):
+    repository.replace_all([_task(f"task{i}", _date(i % 20 + 1)) for i in range(300)])
+    before = server.state.request_count
+
+    stats = calendar_sync.sync_tasks_with_calendar(service)
+
+    assert stats["created"] == 300
+    # 予定一覧の取得1回 + 50件ずつのバッチ6回
+    assert server.state.request_count - before == 7
+    assert len(server.events()) == 300
+
+
+def test_sync_keeps_completed_batches_when_a_batch_fails(server, service, event_cache, repository, monkeypatch):
+    repository.replace_all([_task(f"task{i}", _date(1)) for i in range(5)])
+    monkeypatch.setattr(calendar_sync, "CALENDAR_BATCH_SIZE", 2)
+    new_batch_request = calendar_sync.new_batch_request
+    executed = []
+
+    def failing_batch_request(service, callback):
+        batch = new_batch_request(service, callback)
+        execute = batch.execute
+
+        def flaky_execute(*args, **kwargs):
+            executed.append(1)
+            if len(executed) == 2:
+                raise OSError("connection reset")
+            return execute(*args, **kwargs)
+        batch.execute = flaky_execute
+        return batch
+
+    monkeypatch.setattr(calendar_sync, "new_batch_request", failing_batch_request)
+    stats = calendar_sync.sync_tasks_with_calendar(service)
+
+    assert (stats["created"], stats["failed"]) == (2, 3)
+    assert [bool(task["calendar_event_id"]) for task in repository.all()] == [True, True, False, False, False]
+
+    monkeypatch.setattr(calendar_sync, "new_batch_request", new_batch_request)
+    stats = calendar_sync.sync_tasks_with_calendar(service)
+
+    assert stats["created"] == 3
+    assert len(server.events()) == 5
@@ -0,0 +1,22 @@
+import csv
+
+import log_archive
+
+
+def _write(path, rows):
+    with open(path, "a", newline="", encoding="utf-8") as file:
+        csv.writer(file).writerows(rows)
+
+
+def test_period_rotation_after_header_only_log(tmp_path, monkeypatch):
+    monkeypatch.setattr(log_archive, "LOG_ROTATE_PERIOD", "month")
+    log_path = str(tmp_path / "conversations.csv")
+    _write(log_path, [["datetime", "user_input", "ai_response"]])
+    assert not log_archive.should_rotate(log_path)
+
+    _write(log_path, [["2000-01-01 00:00:00", "質問", "回答"]])
+    assert log_archive.should_rotate(log_path)
+
+    segment_path = log_archive.rotate(log_path)
+    assert log_archive.read_segment_columns(segment_path, ["user_input"]) == {"user_input": ["質問"]}
+    assert not log_archive.should_rotate(log_path)
@@ -0,0 +1,34 @@
+from rag_answer_cache import RagAnswerCache
+
+
+def _embed_counter():
+    calls = []
+
+    def embed(question):
+        calls.append(question)
+        return [1.0, 0.0] if "控除" in question else [0.0, 1.0]
+    return embed, calls
+
+
+def test_miss_then_put_embeds_question_once(tmp_path):
+    cache = RagAnswerCache(str(tmp_path / "answers.db"), semantic=True)
+    embed, calls = _embed_counter()
+
+    cached, embedding = cache.lookup("doc", "外国税額控除とは", embed)
+    assert cached is None
+    cache.put("doc", "外国税額控除とは", "回答", "p.1", embed, embedding)
+
+    assert calls == ["外国税額控除とは"]
+
+
+def test_normalized_and_semantic_hits(tmp_path):
+    cache = RagAnswerCache(str(tmp_path / "answers.db"), semantic=True)
+    embed, calls = _embed_counter()
+    cache.put("doc", "外国税額控除とは", "回答", "p.1", embed)
+
+    # 正規化で一致すれば埋め込みは計算しない
+    assert cache.lookup("doc", "外国税額控除とは？", embed) == (("回答", "p.1"), None)
+    assert len(calls) == 1
+    assert cache.get("doc", "控除の趣旨は", embed) == ("回答", "p.1")
+    assert cache.get("doc", "別の質問", embed) is None
+    assert cache.get("other-doc", "外国税額控除とは", embed) is None
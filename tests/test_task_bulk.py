@@ -0,0 +1,95 @@
+import csv
+import json
+import threading
+
+import pytest
+
+import task_bulk
+import task_store
+from task_store import JournalTaskBackend, TaskRepository
+
+
+def _task(name, status="todo", due_date=""):
+    return {"task_name": name, "due_date": due_date, "status": status,
+            "created_at": "2025-01-01 00:00:00", "calendar_event_id": ""}
+
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = JournalTaskBackend(str(tmp_path / "tasks.csv"), str(tmp_path / "tasks.journal"))
+    backend.initialize()
+    return backend
+
+
+@pytest.fixture
+def repository(backend, monkeypatch):
+    repository = TaskRepository(backend)
+    monkeypatch.setattr(task_store, "_repository", repository)
+    return repository
+
+
+def _run_with_timeout(target, timeout=5.0):
+    thread = threading.Thread(target=target, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), "デッドロックしました"
+
+
+def test_import_jsonl_validates_and_keeps_journal(tmp_path, repository):
+    repository.add(_task("既存"))
+    repository.update(0, {"status": "done"})
+    path = tmp_path / "in.jsonl"
+    rows = [{"task_name": f"task{i}", "due_date": "2025-01-02"} for i in range(25)]
+    rows += [{"task_name": ""}, {"task_name": "x", "due_date": "2025/01/02"}, {"task_name": "y", "status": "doing"}]
+    path.write_text("\n".join(json.dumps(row, ensure_ascii=False) for row in rows) + "\n{broken\n", encoding="utf-8")
+
+    stats = task_bulk.import_tasks(str(path), chunk_size=10)
+
+    assert (stats["imported"], stats["rejected"]) == (25, 4)
+    tasks = repository.all()
+    assert [(task["task_name"], task["status"]) for task in tasks[:2]] == [("既存", "done"), ("task0", "todo")]
+    assert len(tasks) == 26
+    assert repository.count("todo") == 25
+
+
+def test_import_reads_snapshot_at_most_once(tmp_path, repository, backend, monkeypatch):
+    repository.add(_task("既存"))
+    path = tmp_path / "in.csv"
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.DictWriter(file, fieldnames=["task_name", "status"])
+        writer.writeheader()
+        writer.writerows({"task_name": f"task{i}", "status": "todo"} for i in range(100))
+    loads = []
+    load = backend.load
+    monkeypatch.setattr(backend, "load", lambda: loads.append(1) or load())
+
+    assert task_bulk.import_tasks(str(path), chunk_size=10)["imported"] == 100
+    # ジャーナルの畳み込みで1回だけ読む（チャンクごとに全件を読み直さない）
+    assert len(loads) == 1
+
+
+def test_export_round_trip(tmp_path, repository):
+    repository.add(_task("買い物", due_date="2025-01-01"))
+    repository.add(_task("掃除"))
+    repository.update(1, {"status": "done"})
+
+    for name in ("out.csv", "out.jsonl"):
+        assert task_bulk.export_tasks(str(tmp_path / name)) == 2
+    with open(tmp_path / "out.csv", newline="", encoding="utf-8") as file:
+        assert [(row["task_name"], row["status"]) for row in csv.DictReader(file)] == [("買い物", "todo"), ("掃除", "done")]
+    lines = (tmp_path / "out.jsonl").read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line)["task_name"] for line in lines] == ["買い物", "掃除"]
+
+
+def test_bulk_calls_do_not_deadlock_with_background_compaction(tmp_path):
+    backend = JournalTaskBackend(str(tmp_path / "tasks.csv"), str(tmp_path / "tasks.journal"), compact_threshold=1)
+    backend.initialize()
+
+    def run():
+        backend.append(_task("A"))
+        backend.append_many([_task("B")])
+        backend.append(_task("C"))
+        list(backend.iter_tasks())
+
+    _run_with_timeout(run)
+    assert [task["task_name"] for task in backend.load()] == ["A", "B", "C"]
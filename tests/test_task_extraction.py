@@ -0,0 +1,44 @@
+import datetime
+
+import pytest
+
+pytest.importorskip("langchain_core")
+pytest.importorskip("langchain_openai")
+
+from task_extraction import RULE_CONFIDENCE_THRESHOLD, parse_time_info_to_date, rule_based_extraction
+
+
+def _date(days):
+    return (datetime.date.today() + datetime.timedelta(days=days)).isoformat()
+
+
+@pytest.mark.parametrize("text, name, time_info, due_date", [
+    ("Google明日の13時から14時までMTGという予定を追加してほしい", "MTG", "明日13時から14時", _date(1)),
+    ("明日までにレポートを書く", "レポートを書く", "明日", _date(1)),
+    ("今日中に牛乳を買う", "牛乳を買う", "今日", _date(0)),
+    ("12月25日の17時から19時までパーティー", "パーティー", "12月25日17時から19時", None),
+])
+def test_confident_rule_results_are_correct(text, name, time_info, due_date):
+    task_name, extracted_time, confidence = rule_based_extraction(text)
+
+    assert confidence >= RULE_CONFIDENCE_THRESHOLD
+    assert (task_name, extracted_time) == (name, time_info)
+    if due_date is not None:
+        assert parse_time_info_to_date(extracted_time) == due_date
+
+
+@pytest.mark.parametrize("text", [
+    # タスク名に曜日・依頼の言い回しが残る
+    "来週の火曜日15時から会議をカレンダーに入れて",
+    # 「中」が接尾辞か名前の一部か判別できない
+    "明日中間レポートを出す",
+    # 除いた日付の一部が時間情報に入っていない
+    "明日と来週に歯医者",
+    # ルールでは時間情報にできない時間帯の言葉
+    "今日の夕方に会議",
+    "明日の昼に歯医者",
+    "今日の深夜に作業",
+    "明日の晩に電話",
+])
+def test_uncertain_rule_results_go_to_llm(text):
+    assert rule_based_extraction(text)[2] < RULE_CONFIDENCE_THRESHOLD
@@ -0,0 +1,49 @@
+import pytest
+
+from task_matcher import TaskMatcher
+
+MIN_SCORE = 0.4
+
+
+def _best(names, hint):
+    matcher = TaskMatcher()
+    for i, name in enumerate(names):
+        matcher.add(i, name)
+    results = matcher.search(hint, limit=1, min_score=MIN_SCORE)
+    return names[results[0][1]] if results else None
+
+
+@pytest.mark.parametrize("names, hint, expected", [
+    # 長い発話の中に短いタスク名がある
+    (["英語", "数学"], "英語の宿題やった", "英語"),
+    (["プレゼン", "買い物"], "プレゼン資料の準備が完了した", "プレゼン"),
+    (["プレゼン", "買い物"], "プレゼン資料の準備がした", "プレゼン"),
+    # 短いヒントが長いタスク名の一部
+    (["英語の宿題", "牛乳を買う"], "宿題", "英語の宿題"),
+    # 全角・半角と大文字・小文字の違い
+    (["ＡＰＩ設計レビュー"], "api設計", "ＡＰＩ設計レビュー"),
+    # 同じ被覆率なら長さの近いタスク
+    (["英語", "英語の宿題"], "英語の宿題", "英語の宿題"),
+])
+def test_search_finds_task(names, hint, expected):
+    assert _best(names, hint) == expected
+
+
+@pytest.mark.parametrize("names, hint", [
+    (["資料作成"], "資料送付"),
+    (["英語の宿題"], "買い物"),
+    # 言い回しが共通するだけの別タスク
+    (["田中さんに電話する"], "佐藤さんに電話する"),
+    (["牛乳を買う"], "パンを買う"),
+    (["英語の宿題"], "数学の宿題"),
+    (["会議資料の作成"], "会議資料の送付"),
+])
+def test_search_rejects_unrelated(names, hint):
+    assert _best(names, hint) is None
+
+
+def test_removed_task_is_not_found():
+    matcher = TaskMatcher()
+    matcher.add(0, "英語")
+    matcher.remove(0)
+    assert matcher.search("英語の宿題やった") == []
@@ -0,0 +1,179 @@
+import os
+import json
+
+from task_store import JournalTaskBackend, TaskRepository, _read_csv, _write_csv
+
+
+def _task(name, status="todo", due_date=""):
+    return {"task_name": name, "due_date": due_date, "status": status,
+            "created_at": "2025-01-01 00:00:00", "calendar_event_id": ""}
+
+
+def _make_backend(tmp_path, threshold=1000):
+    backend = JournalTaskBackend(str(tmp_path / "tasks.csv"), str(tmp_path / "tasks.journal"), threshold)
+    backend.initialize()
+    return backend
+
+
+def _names(tasks):
+    return [(task["task_name"], task["status"]) for task in tasks]
+
+
+def test_replay_applies_journal_to_snapshot(tmp_path):
+    backend = _make_backend(tmp_path)
+    backend.replace_all([_task("A")])
+    backend.append(_task("B"))
+    backend.update(0, {"status": "done"})
+
+    assert _names(_read_csv(backend.csv_file)) == [("A", "todo")]
+    assert _names(JournalTaskBackend(backend.csv_file, backend.journal_file).load()) == [("A", "done"), ("B", "todo")]
+
+
+def test_replay_ignores_torn_last_line(tmp_path):
+    backend = _make_backend(tmp_path)
+    backend.append(_task("A"))
+    with open(backend.journal_file, "a", encoding="utf-8") as file:
+        file.write('{"op": "add", "task": {"task_na')
+
+    assert _names(backend.load()) == [("A", "todo")]
+
+
+def test_compact_folds_journal_into_snapshot(tmp_path):
+    backend = _make_backend(tmp_path)
+    backend.append(_task("A"))
+    backend.update(0, {"status": "done"})
+    backend.compact()
+
+    assert not os.path.exists(backend.journal_file)
+    assert not os.path.exists(backend.compacting_file)
+    assert _names(_read_csv(backend.csv_file)) == [("A", "done")]
+
+
+def test_external_edit_keeps_journal(tmp_path):
+    backend = _make_backend(tmp_path)
+    backend.replace_all([_task("A")])
+    backend.append(_task("B"))
+    backend.update(0, {"status": "done"})
+    with open(backend.csv_file, "a", encoding="utf-8", newline="") as file:
+        file.write("hand-added,,todo,2025-01-02 00:00:00,\n")
+
+    tasks = JournalTaskBackend(backend.csv_file, backend.journal_file).load()
+
+    assert _names(tasks) == [("A", "done"), ("hand-added", "todo"), ("B", "todo")]
+
+
+def test_external_edit_does_not_shift_journal_updates(tmp_path):
+    backend = _make_backend(tmp_path)
+    backend.replace_all([_task("A")])
+    backend.append(_task("B"))
+    backend.update(1, {"status": "done"})
+    with open(backend.csv_file, "a", encoding="utf-8", newline="") as file:
+        file.write("hand-added,,todo,2025-01-02 00:00:00,\n")
+
+    tasks = JournalTaskBackend(backend.csv_file, backend.journal_file).load()
+
+    assert _names(tasks) == [("A", "todo"), ("hand-added", "todo"), ("B", "done")]
+
+
+def test_external_insert_in_the_middle(tmp_path):
+    backend = _make_backend(tmp_path)
+    repository = TaskRepository(backend)
+    repository.replace_all([_task("A"), _task("C")])
+    repository.add(_task("B"))
+    repository.update(1, {"status": "done"})
+    repository.update(2, {"status": "done"})
+    _write_csv(backend.csv_file, [_task("A"), _task("X"), _task("C")])
+
+    tasks = JournalTaskBackend(backend.csv_file, backend.journal_file).load()
+
+    assert _names(tasks) == [("A", "todo"), ("X", "todo"), ("C", "done"), ("B", "done")]
+    # 照合した結果はその場でスナップショットに畳み込まれ、以降の行番号は新しい並びに従う
+    assert not os.path.exists(backend.journal_file)
+    assert _names(_read_csv(backend.csv_file)) == _names(tasks)
+
+
+def test_legacy_base_record_is_ignored(tmp_path):
+    backend = _make_backend(tmp_path)
+    _write_csv(backend.csv_file, [_task("A"), _task("hand-added")])
+    with open(backend.journal_file, "w", encoding="utf-8") as file:
+        file.write(json.dumps({"op": "base", "rows": 1}) + "\n")
+        file.write(json.dumps({"op": "update", "index": 0, "fields": {"status": "done"}}) + "\n")
+
+    assert _names(backend.load()) == [("A", "done"), ("hand-added", "todo")]
+
+
+def test_crash_before_snapshot_replaced_rolls_forward(tmp_path):
+    backend = _make_backend(tmp_path)
+    backend.replace_all([_task("A")])
+    backend.append(_task("B"))
+    # 新しいスナップショットを書き、ジャーナルを改名したところで落ちた状態
+    _write_csv(backend.next_snapshot_file, backend.load())
+    os.replace(backend.journal_file, backend.compacting_file)
+
+    tasks = JournalTaskBackend(backend.csv_file, backend.journal_file).load()
+
+    assert _names(tasks) == [("A", "todo"), ("B", "todo")]
+    assert not os.path.exists(backend.compacting_file)
+    assert not os.path.exists(backend.next_snapshot_file)
+
+
+def test_crash_after_snapshot_replaced_does_not_reapply(tmp_path):
+    backend = _make_backend(tmp_path)
+    backend.append(_task("A"))
+    # tasks.csvを置き換えた後、.compactingを消す前に落ちた状態
+    _write_csv(backend.csv_file, backend.load())
+    os.replace(backend.journal_file, backend.compacting_file)
+
+    restarted = JournalTaskBackend(backend.csv_file, backend.journal_file)
+    restarted.append(_task("B"))
+
+    assert _names(restarted.load()) == [("A", "todo"), ("B", "todo")]
+    assert not os.path.exists(backend.compacting_file)
+
+
+def test_crash_before_journal_renamed_keeps_journal(tmp_path):
+    backend = _make_backend(tmp_path)
+    backend.append(_task("A"))
+    # 新しいスナップショットを書き終える前に落ちた状態
+    with open(backend.next_snapshot_file, "w", encoding="utf-8") as file:
+        file.write("task_name,due")
+
+    tasks = JournalTaskBackend(backend.csv_file, backend.journal_file).load()
+
+    assert _names(tasks) == [("A", "todo")]
+    assert not os.path.exists(backend.next_snapshot_file)
+
+
+def test_background_compaction_keeps_all_records(tmp_path):
+    backend = _make_backend(tmp_path, threshold=10)
+    for i in range(35):
+        backend.append(_task(f"task{i}"))
+    backend.wait_for_compaction()
+
+    assert len(JournalTaskBackend(backend.csv_file, backend.journal_file).load()) == 35
+
+
+def test_repository_counts_follow_journal(tmp_path):
+    repository = TaskRepository(_make_backend(tmp_path))
+    repository.add(_task("A", due_date="2025-02-01"))
+    repository.add(_task("B", due_date="2025-01-01"))
+    repository.update(1, {"status": "done"})
+
+    assert repository.count("todo") == 1
+    assert [task["task_name"] for _, task in repository.next_due(5)] == ["A"]
+
+
+def test_repository_returns_copies(tmp_path):
+    repository = TaskRepository(_make_backend(tmp_path))
+    repository.add(_task("A", due_date="2025-01-01"))
+    repository.add(_task("B", due_date="2025-02-01"))
+
+    repository.all()[0]["status"] = "done"
+    repository.filter("todo")[0][1]["status"] = "done"
+    repository.next_due(1)[0][1]["status"] = "done"
+    assert repository.count("todo") == 2
+
+    repository.update(0, {"status": "done"})
+    assert repository.count("todo") == 1
+    assert repository.count("done") == 1
+    assert [task["task_name"] for _, task in repository.next_due(5)] == ["B"]
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import re
+import sys
+import time
+import wave
+import queue
+import hashlib
+import threading
+import traceback
+import multiprocessing
+from collections import OrderedDict
+from typing import Callable, List, Optional
+
+# 環境に応じたパス自動検出（Googleコラボとローカル両対応）
+if os.path.exists('/content/drive/MyDrive/todo-app/Style-Bert-VITS2'):
+    STYLE_BERT_ROOT = '/content/drive/MyDrive/todo-app/Style-Bert-VITS2'
+else:
+    STYLE_BERT_ROOT = '/Users/yoshinomukanou/todo-app/Style-Bert-VITS2'
+TTS_MODEL_NAME = "yoshino_test"
+TTS_AUDIO_DIR = STYLE_BERT_ROOT.replace('/Style-Bert-VITS2', '/audio')
+TTS_AUDIO_CACHE_MAX_BYTES = int(os.getenv("TTS_AUDIO_CACHE_MAX_MB", "200")) * 1024 * 1024
+
+_SENTENCE_END = re.compile(r'(?<=。)')
+
+
+def split_sentences(text: str) -> List[str]:
+    """「。」で文に分割する（句点は各文に残す）"""
+    return [sentence.strip() for sentence in _SENTENCE_END.split(text) if sentence.strip()]
+
+
+def wav_duration(path: str) -> float:
+    try:
+        with wave.open(path, 'rb') as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except (OSError, wave.Error, ZeroDivisionError):
+        return 0.0
+
+
+class AudioCache:
+    """
+    合成済み音声のキャッシュ（テキストとモデルのハッシュをファイル名にする）
+
+    締めの決まり文句のように繰り返し出てくる文は再合成せずに使い回す。
+    ディレクトリの合計サイズが上限を超えたら、最後に使われた時刻が古いものから消す。
+    合成中のファイルはtmp/に書き、完成してからキャッシュへ移す。
+    """
+
+    def __init__(self, cache_dir: str = os.path.join(TTS_AUDIO_DIR, "cache"), model_name: str = TTS_MODEL_NAME,
+                 max_bytes: int = TTS_AUDIO_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.tmp_dir = os.path.join(cache_dir, "tmp")
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # ファイル名 → サイズ（古い順）
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        # 合成途中で落ちたときの残りを消す
+        for name in os.listdir(self.tmp_dir):
+            try:
+                os.remove(os.path.join(self.tmp_dir, name))
+            except OSError:
+                pass
+        files = []
+        for name in os.listdir(cache_dir):
+            if name.endswith('.tmp.wav'):
+                # 以前の命名の一時ファイル
+                os.remove(os.path.join(cache_dir, name))
+            elif name.endswith('.wav'):
+                stat = os.stat(os.path.join(cache_dir, name))
+                files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self._total += size
+
+    def path_for(self, text: str) -> str:
+        key = hashlib.sha256(f"{self.model_name}\0{text}".encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, f"{key}.wav")
+
+    def tmp_path_for(self, path: str) -> str:
+        """合成中に書き込むパス（拡張子は.wavのまま、キャッシュとは別のディレクトリ）"""
+        return os.path.join(self.tmp_dir, os.path.basename(path))
+
+    def lookup(self, text: str) -> Optional[str]:
+        path = self.path_for(text)
+        name = os.path.basename(path)
+        with self._lock:
+            if name not in self._entries or not os.path.exists(path):
+                return None
+            self._entries.move_to_end(name)
+        os.utime(path)
+        return path
+
+    def add(self, path: str) -> None:
+        name = os.path.basename(path)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._total += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            while self._total > self.max_bytes and len(self._entries) > 1:
+                old_name, old_size = self._entries.popitem(last=False)
+                self._total -= old_size
+                try:
+                    os.remove(os.path.join(self.cache_dir, old_name))
+                except FileNotFoundError:
+                    pass
+
+
+class TTSWorker:
+    """
+    読み上げをバックグラウンドで行うワーカー
+
+    テキストを文単位に分け、合成スレッドが1文ずつ音声ファイルにし、
+    再生スレッドが出来上がった順に再生する。最初の1文を再生している間に
+    次の文を合成するので、長い回答でも最初の音が出るまでが短く、
+    speak()はすぐに戻るのでメインループは次の質問を受け付けられる。
+    AudioCacheにある文は合成を飛ばしてそのまま再生する。
+    """
+
+    def __init__(self, synthesize: Callable[[str, str], bool], play: Callable[[str], None],
+                 audio_cache: AudioCache):
+        self._synthesize = synthesize
+        self._play = play
+        self._audio_cache = audio_cache
+        self._sentences: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._audio: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._synth_thread = threading.Thread(target=self._synth_loop, name="tts-synth", daemon=True)
+        self._play_thread = threading.Thread(target=self._play_loop, name="tts-play", daemon=True)
+        self._synth_thread.start()
+        self._play_thread.start()
+
+    def speak(self, text: str) -> None:
+        for sentence in split_sentences(text):
+            self._sentences.put(sentence)
+
+    def _synth_loop(self) -> None:
+        while True:
+            sentence = self._sentences.get()
+            if sentence is None:
+                self._audio.put(None)
+                return
+            try:
+                cached_path = self._audio_cache.lookup(sentence)
+                if cached_path:
+                    self._audio.put(cached_path)
+                    continue
+                out_path = self._audio_cache.path_for(sentence)
+                tmp_path = self._audio_cache.tmp_path_for(out_path)
+                try:
+                    if self._synthesize(sentence, tmp_path):
+                        os.replace(tmp_path, out_path)
+                        self._audio_cache.add(out_path)
+                        self._audio.put(out_path)
+                finally:
+                    if os.path.exists(tmp_path):
+                        os.remove(tmp_path)
+            except Exception as e:
+                traceback.print_exc()
+                print(f"[TTS] 合成エラー: {type(e).__name__}: {e}")
+
+    def _play_loop(self) -> None:
+        while True:
+            out_path = self._audio.get()
+            if out_path is None:
+                return
+            try:
+                self._play(out_path)
+                # 前の文を鳴らし終えるまで次の文を再生しない
+                time.sleep(wav_duration(out_path))
+            except Exception as e:
+                print(f"[TTS] 再生エラー: {type(e).__name__}: {e}")
+
+    def close(self, wait: bool = True) -> None:
+        self._sentences.put(None)
+        if wait:
+            self._synth_thread.join()
+            self._play_thread.join()
+
+
+def _tts_process_main(conn, style_bert_root: str, model_name: str) -> None:
+    """
+    TTSワーカープロセスの本体
+
+    起動直後にpyopenjtalk・ユーザー辞書・モデルを読み込んでおき、
+    以降はパイプで(テキスト, 出力パス)を受け取って合成する。
+    カレントディレクトリの変更はこのプロセス内だけで行う。
+    """
+    # pyopenjtalk を直接使用（ワーカーモード無効）
+    os.environ["PYOPENJTALK_G2P_WORKER"] = "0"
+    sys.path.insert(0, style_bert_root)
+    os.chdir(style_bert_root)
+    model = None
+    try:
+        import pyopenjtalk  # noqa: F401
+        from style_bert_vits2.nlp.japanese.user_dict import update_dict
+        update_dict()
+        from model_load import load_model
+        model = load_model(model_name, model_dir=f"{style_bert_root}/model_assets", device="cpu")
+        conn.send((True, ""))
+    except Exception as e:
+        traceback.print_exc()
+        conn.send((False, f"{type(e).__name__}: {e}"))
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        text, out_path = request
+        if model is None:
+            conn.send((False, "モデルが読み込まれていません"))
+            continue
+        try:
+            model.inference(text, out_path)
+            conn.send((True, ""))
+        except Exception as e:
+            traceback.print_exc()
+            conn.send((False, f"{type(e).__name__}: {e}"))
+
+
+class TTSProcess:
+    """常駐するTTSワーカープロセスへのクライアント（生成と同時にウォームアップを始める）"""
+
+    def __init__(self, style_bert_root: str = STYLE_BERT_ROOT, model_name: str = TTS_MODEL_NAME):
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        self._process = context.Process(
+            target=_tts_process_main, args=(child_conn, style_bert_root, model_name),
+            name="tts-worker", daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+        self._lock = threading.Lock()
+        self._ready: Optional[bool] = None
+
+    def _wait_ready(self) -> bool:
+        if self._ready is None:
+            ok, error = self._conn.recv()
+            self._ready = ok
+            if ok:
+                print("[TTS] ワーカー準備完了")
+            else:
+                print(f"[TTS] ワーカー初期化失敗: {error}")
+        return self._ready
+
+    def synthesize(self, text: str, out_path: str) -> bool:
+        with self._lock:
+            try:
+                if not self._wait_ready():
+                    return False
+                self._conn.send((text, os.path.abspath(out_path)))
+                ok, error = self._conn.recv()
+            except (EOFError, OSError) as e:
+                print(f"[TTS] ワーカーとの通信に失敗しました: {e}")
+                self._ready = False
+                return False
+            if not ok:
+                print(f"[TTS] 合成エラー: {error}")
+            return ok
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.send(None)
+            except (OSError, ValueError):
+                pass
+            self._process.join(timeout=5)